@@ -1,180 +1,231 @@
-import streamlit as st
-import pandas as pd
-import pandas_market_calendars as mcal
-from datetime import datetime, date, timedelta
-
-TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
-
-
-def get_short_weeks_with_holidays(start_date, end_date, market_calendar="NYSE"):
-    """Identify weeks with holidays (short trading weeks)"""
-    import pandas as pd
-
-    cal = mcal.get_calendar(market_calendar)
-
-    # Get trading schedule for a broader range to check full weeks
-    # Extend range to include full weeks that might be partially in our date range
-    extended_start = pd.to_datetime(start_date) - timedelta(days=pd.to_datetime(start_date).weekday())
-    extended_end = pd.to_datetime(end_date) + timedelta(days=6 - pd.to_datetime(end_date).weekday())
+import os
+import tempfile
+import threading
+from datetime import datetime, time as time_of_day, timedelta
 
-    trading_schedule = cal.schedule(start_date=extended_start, end_date=extended_end)
-    holidays = cal.holidays().holidays
-
-    short_weeks = []
-
-    # Group by week (Monday to Friday)
-    current_date = extended_start
-
-    while current_date <= extended_end:
-        # Find Monday of current week
-        week_start = current_date - timedelta(days=current_date.weekday())
-        week_end = week_start + timedelta(days=4)  # Friday
-
-        # Get all potential trading days for this full week (Mon-Fri)
-        full_week_trading_days = trading_schedule[
-            (trading_schedule.index.date >= week_start.date()) &
-            (trading_schedule.index.date <= week_end.date())
-        ]
-
-        # Check for holidays in this week
-        week_holidays = [h for h in holidays
-                        if week_start.date() <= h <= week_end.date()]
-
-        # Only consider it a short week if:
-        # 1. It has fewer than 5 trading days
-        # 2. It has at least 1 trading day
-        # 3. Some part of the week overlaps with our original date range
-        week_overlaps_range = (
-            week_start.date() <= pd.to_datetime(end_date).date() and
-            week_end.date() >= pd.to_datetime(start_date).date()
-        )
-
-        if (len(full_week_trading_days) < 5 and
-            len(full_week_trading_days) > 0 and
-            week_overlaps_range):
-
-            # Only include trading dates that fall within our original date range
-            filtered_trading_dates = [
-                d.date() for d in full_week_trading_days.index
-                if pd.to_datetime(start_date).date() <= d.date() <= pd.to_datetime(end_date).date()
-            ]
+import numpy as np
+import pandas as pd
+import streamlit as st
 
-            if filtered_trading_dates:  # Only add if there are trading dates in our range
-                short_weeks.append({
-                    'week_start': week_start.date(),
-                    'week_end': week_end.date(),
-                    'trading_days': len(full_week_trading_days),  # Full week count
-                    'trading_dates': filtered_trading_dates,  # Only dates in range
-                    'holidays': week_holidays
-                })
-
-        # Move to next week
-        current_date = week_start + timedelta(days=7)
-
-    return short_weeks
-
-
-def generate_timestamps(
-    start_date: date,
-    end_date: date,
-    interval_min: int,
-    selected_months=None,
-    selected_weekdays=None,
-    selected_week_types=None,
-    market_calendar="NYSE",
-):
-    """Generate timestamps with 9:32 AM entry and 9:35-3:59 PM intervals for market trading days"""
-    timestamps = []
-
-    # Get market calendar
-    cal = mcal.get_calendar(market_calendar)
-
-    # Get trading days in the date range
-    trading_schedule = cal.schedule(start_date=start_date, end_date=end_date)
-
-    # If filtering by week types, get the valid dates
-    valid_dates = set()
-    if selected_week_types and len(selected_week_types) < 3:  # Not all types selected
-        short_weeks = get_short_weeks_with_holidays(start_date, end_date, market_calendar)
-
-        # Get short week dates
-        short_week_dates = set()
-        for week in short_weeks:
-            short_week_dates.update(week['trading_dates'])
-
-        # Get week before short week dates
-        week_before_short_dates = set()
-        for week in short_weeks:
-            # Find the week before this short week
-            week_start = week['week_start']
-            prev_week_start = week_start - timedelta(days=7)
-            prev_week_end = prev_week_start + timedelta(days=4)
-
-            # Get trading days for the previous week
-            prev_week_trading = trading_schedule[
-                (trading_schedule.index.date >= prev_week_start) &
-                (trading_schedule.index.date <= prev_week_end)
+from timestamps_smith import (
+    CHUNK_ROWS,
+    DEFAULT_SESSION,
+    EXPORT_FORMATS,
+    PROFILE_ENV,
+    TIMESTAMP_COLUMN,
+    WEEK_TYPES,
+    SessionGrid,
+    SessionSpec,
+    estimate_timestamps,
+    filter_key,
+    filter_sessions,
+    format_size,
+    format_timestamps,
+    get_short_weeks_with_holidays,
+    intraday_offsets,
+    iter_timestamp_chunks,
+    parse_profile_modes,
+    profile,
+    result_cache,
+)
+
+# Requests over this many timestamps get a warning before they are generated
+LARGE_REQUEST_ROWS = 500_000
+
+# Seconds between two updates of a running export's progress bar
+EXPORT_POLL_SECONDS = 0.25
+
+
+def format_clock(minute):
+    """12-hour clock time of a number of minutes after midnight, e.g. 3:55 PM"""
+    hours, minutes = divmod(int(minute), 60)
+    return f"{hours % 12 or 12}:{minutes:02d} {'AM' if hours % 24 < 12 else 'PM'}"
+
+
+def export_timestamps(format_name, chunks):
+    """Row count and file contents of timestamp chunks in an export format"""
+    # Stream the export into a temporary file instead of holding strings, a DataFrame and the
+    # encoded file in memory at once
+    with tempfile.TemporaryFile() as export_file:
+        row_count = EXPORT_FORMATS[format_name].write(chunks, export_file)
+        export_file.seek(0)
+        return row_count, export_file.read()
+
+
+class ExportCancelled(Exception):
+    """Raised in an export's worker thread once the export is cancelled"""
+
+
+class ExportJob:
+    """Export of a request running in a background thread, kept in the session state
+
+    The request is the app's ``timestamp_filters`` tuple: start and end date, interval, months,
+    weekdays, week types and session spec, in the argument order of ``iter_timestamp_chunks``.
+    The worker counts the rows of each chunk it hands to the writer, so reruns of the script can
+    poll ``progress``, and stops at the next chunk once cancelled. Finished exports are memoized
+    in ``result_cache`` under ``key``, which a cancelled export never reaches. With
+    ``profile_modes``, the worker records its own ``report``, since the export outlives the
+    script run that started it.
+    """
+
+    def __init__(self, key, total_rows, format_name, timestamp_filters, profile_modes=None):
+        self.key = key
+        self.total_rows = total_rows
+        self.rows = 0
+        self.result = None
+        self.error = None
+        self.profile_modes = profile_modes
+        self.report = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(format_name, timestamp_filters), daemon=True)
+        self._thread.start()
+
+    @property
+    def done(self):
+        return not self._thread.is_alive()
+
+    @property
+    def progress(self):
+        """Fraction of the rows written so far"""
+        return min(self.rows / self.total_rows, 1.0) if self.total_rows else 1.0
+
+    def wait(self, timeout):
+        self._thread.join(timeout)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _chunks(self, timestamp_filters):
+        *filters, session_spec = timestamp_filters
+        for chunk in iter_timestamp_chunks(*filters, chunk_rows=CHUNK_ROWS, session_spec=session_spec):
+            if self._cancelled.is_set():
+                raise ExportCancelled
+            yield chunk
+            self.rows += len(chunk)
+
+    def _run(self, format_name, timestamp_filters):
+        if self.profile_modes is None:
+            self._export(format_name, timestamp_filters)
+        else:
+            with profile(self.profile_modes) as self.report:
+                self._export(format_name, timestamp_filters)
+
+    def _export(self, format_name, timestamp_filters):
+        try:
+            self.result = result_cache.get(
+                self.key, lambda: export_timestamps(format_name, self._chunks(timestamp_filters))
+            )
+        except ExportCancelled:
+            pass
+        except Exception as exc:
+            self.error = exc
+
+
+def show_profile(report, label="Profile"):
+    """Expander with the stage timings, memory peak and cProfile report of a profiled run"""
+    with st.expander(label):
+        st.caption(f"Run took {report.duration * 1000:,.1f} ms")
+        stages = pd.DataFrame(report.summary(), columns=["name", "depth", "calls", "total_ms", "max_ms"])
+        stages["name"] = ["  " * depth + name for depth, name in zip(stages["depth"], stages["name"])]
+        st.dataframe(stages.drop(columns="depth"), hide_index=True)
+        if report.peak_memory is not None:
+            st.caption(f"Traced memory peak: {format_size(report.peak_memory)}")
+            st.code("\n".join(report.top_allocations), language=None)
+        if report.cprofile is not None:
+            st.code(report.cprofile, language=None)
+
+
+def show_export(job, format_name, timestamp_filters, selected_weekdays_names, polling):
+    """Progress of an export job, then its result: summary, preview, format and download button
+
+    Runs as a fragment, which reruns on its own every ``EXPORT_POLL_SECONDS`` while ``polling``
+    a running job, so the rest of the page stays rendered and no script run waits on the job.
+    """
+    (
+        start_date, end_date, interval_mins, selected_months, selected_weekdays, selected_week_types,
+        session_spec
+    ) = timestamp_filters
+    export_format = EXPORT_FORMATS[format_name]
+
+    if not job.done:
+        st.progress(job.progress, text=f"Generating timestamps... {job.rows:,} of {job.total_rows:,}")
+        if st.button("Cancel", icon="✖️"):
+            job.cancel()
+            del st.session_state["export_job"], st.session_state["timestamp_filters"]
+            st.rerun()
+        return
+    if polling:
+        # The job just finished: rerun the page once, which shows the result without polling
+        st.rerun()
+
+    row_count, export_data = job.result or (0, None)
+    if job.error is not None:
+        st.exception(job.error)
+    elif row_count:
+        # Display info
+        st.success(f"Generated {row_count} timestamps")
+        st.info(f"Date range: {start_date} to {end_date}")
+        offsets = intraday_offsets(interval_mins, session_spec=session_spec)
+        if len(offsets):
+            st.info(
+                f"Time range: {format_clock(offsets[0])} to {format_clock(offsets[-1])} on regular "
+                f"sessions ({interval_mins}-minute intervals)"
+            )
+
+        # Display filter info
+        if len(selected_months) < 12:
+            month_names = [
+                datetime(2023, m, 1).strftime("%B") for m in selected_months
             ]
-
-            for trading_day in prev_week_trading.index:
-                if start_date <= trading_day.date() <= end_date:
-                    week_before_short_dates.add(trading_day.date())
-
-        # Get all trading dates in range
-        all_trading_dates = set(trading_schedule.index.date)
-
-        # Regular weeks are all dates minus short weeks minus week before short weeks
-        regular_week_dates = all_trading_dates - short_week_dates - week_before_short_dates
-
-        # Add selected week types to valid_dates
-        if "Short weeks" in selected_week_types:
-            valid_dates.update(short_week_dates)
-        if "Week before short week" in selected_week_types:
-            valid_dates.update(week_before_short_dates)
-        if "Regular weeks" in selected_week_types:
-            valid_dates.update(regular_week_dates)
-
-    for trading_day in trading_schedule.index:
-        current_date = trading_day.date()
-
-        # Filter by week types if specified
-        if selected_week_types and len(selected_week_types) < 3 and current_date not in valid_dates:
-            continue
-
-        # Filter by selected months if specified
-        if selected_months and current_date.month not in selected_months:
-            continue
-
-        if selected_weekdays and current_date.weekday() not in selected_weekdays:
-            continue
-
-        # Generate interval timestamps from 9:35 AM to 3:59 PM
-        start_time = datetime.combine(
-            current_date, datetime.min.time().replace(hour=9, minute=30)
-        )
-        end_time = datetime.combine(
-            current_date, datetime.min.time().replace(hour=15, minute=59)
-        )
-
-        current_time = start_time
-        while current_time <= end_time:
-            # if current_time is exactly 9:30 AM, change it to 9:32 AM
-            if current_time.hour == 9 and current_time.minute == 30:
-                current_time += timedelta(minutes=2)
-            timestamps.append(current_time.strftime(TIMESTAMP_FORMAT))
-            current_time += timedelta(minutes=interval_min)
-
-    return timestamps
-
-
-@st.cache_data
-def convert_for_download(df):
-    return df.to_csv(index=False).encode("utf-8")
-
-
-def main():
+            st.info(f"Months: {', '.join(month_names)}")
+
+        if len(selected_weekdays_names) < 7:
+            st.info(f"Days: {', '.join(selected_weekdays_names)}")
+
+        # Show preview
+        st.subheader("Preview (First 20 rows)")
+        preview = next(iter_timestamp_chunks(
+            start_date, end_date, interval_mins, selected_months, selected_weekdays,
+            selected_week_types, chunk_rows=20, session_spec=session_spec
+        ))
+        st.dataframe(pd.DataFrame({TIMESTAMP_COLUMN: format_timestamps(preview)}))
+
+        # Export format and download button
+        col_format, col_download = st.columns(2)
+        with col_format:
+            st.selectbox(
+                "Export format",
+                options=list(EXPORT_FORMATS),
+                format_func=lambda name: EXPORT_FORMATS[name].label,
+                key="export_format",
+                label_visibility="collapsed",
+            )
+            if st.session_state["export_format"] != format_name:
+                # Another format is a new export job, which the whole page starts
+                st.rerun()
+
+        with col_download:
+            st.download_button(
+                label=f"📥 Download {export_format.label}",
+                data=export_data,
+                file_name=(
+                    f"timestamps_{start_date}_to_{end_date}_{interval_mins}mins"
+                    f"{export_format.extension}"
+                ),
+                mime=export_format.mime,
+                help=f"Download the generated timestamps as a {export_format.label} file",
+            )
+
+    else:
+        st.warning("No timestamps generated. Please check your date range.")
+
+    if job.report is not None:
+        show_profile(job.report, "Export profile")
+
+
+def main(profile_modes=None):
     st.title("📅 🔨 Timestamps Smith")
-    st.markdown("Generate timestamps between 9:35 AM and 3:55 PM")
+    st.markdown("Generate intraday timestamps for trading days, following each session's open and close")
 
     # Date range selector
     col1, col2, col3 = st.columns(3)
@@ -192,7 +243,7 @@ def main():
 
     with col3:
         interval_mins = st.number_input(
-            "Interval (mins)", value=5, help="Timestamp intervals (mins)"
+            "Interval (mins)", min_value=1, value=5, help="Timestamp intervals (mins)"
         )
 
     # Filters
@@ -221,14 +272,49 @@ def main():
         selected_weekdays = [weekday_mapping[name] for name in selected_weekdays_names]
 
     with col6:
-        week_type_options = ["Short weeks", "Week before short week", "Regular weeks"]
+        week_type_options = list(WEEK_TYPES)
         selected_week_types = st.multiselect(
             "Select Week Types",
             options=week_type_options,
             default=week_type_options,
-            help="Filter by week type: short weeks (with holidays), weeks before short weeks, or regular weeks"
+            help=(
+                "Filter by week type: short weeks (with holidays), weeks before short weeks, or regular "
+                "weeks. Types come from the full calendar, so a week at the end of the range that "
+                "precedes a short week counts as a week before short week even when the short week "
+                "is past the end date"
+            ),
         )
 
+    # Session rules: where each day's timestamps start and stop
+    with st.expander("Session rules"):
+        col7, col8, col9, col10 = st.columns(4)
+
+        with col7:
+            entry_delay = st.number_input(
+                "Entry delay (mins)",
+                min_value=0,
+                value=DEFAULT_SESSION.entry_delay,
+                help="Minutes after each session's open of the first timestamp",
+            )
+
+        with col8:
+            close_margin = st.number_input(
+                "Close margin (mins)",
+                min_value=0,
+                value=DEFAULT_SESSION.close_margin,
+                help="Minimum minutes between the last timestamp and each session's close",
+            )
+
+        with col9:
+            window_start = st.time_input(
+                "From", value=time_of_day(9, 30), help="Earliest timestamp of the day"
+            )
+
+        with col10:
+            window_end = st.time_input("To", value=time_of_day(16, 0), help="Latest timestamp of the day")
+
+    session_spec = SessionSpec(entry_delay, close_margin, windows=[(window_start, window_end)])
+
     # Validate date range
     if start_date > end_date:
         st.error("Start date must be before or equal to end date!")
@@ -262,77 +348,113 @@ def main():
             st.info("No short weeks found in the selected date range.")
 
     st.subheader("Generate Dates/Timestamps")
+
+    # Size the request from the filtered schedule, without generating it, so that expensive runs
+    # can be narrowed down before clicking
+    estimate = estimate_timestamps(
+        start_date, end_date, interval_mins, selected_months, selected_weekdays, selected_week_types,
+        session_spec=session_spec
+    )
+    sizes = []
+    for export_format in EXPORT_FORMATS.values():
+        try:
+            size = export_format.size(estimate.rows)
+        except ImportError:
+            continue  # the Arrow sizes are measured with pyarrow, which is optional
+        sizes.append(f"{export_format.label} {'' if export_format.exact_size else '~'}{format_size(size)}")
+    st.caption(
+        f"{estimate.rows:,} timestamps on {estimate.days:,} trading days · {' · '.join(sizes)} · "
+        f"{format_size(estimate.array_bytes)} in memory"
+    )
+    if estimate.rows > LARGE_REQUEST_ROWS:
+        st.warning(
+            f"This request has {estimate.rows:,} timestamps and may take a while to generate; "
+            f"consider a shorter date range or a longer interval."
+        )
+
     col_gen1, col_gen2 = st.columns(2)
+    timestamp_filters = (
+        start_date, end_date, interval_mins, selected_months, selected_weekdays, selected_week_types,
+        session_spec
+    )
     with col_gen1:
         if st.button("Timestamps", icon="⏱️"):
-            with st.spinner("Generating timestamps..."):
-                timestamps = generate_timestamps(
-                    start_date, end_date, interval_mins, selected_months, selected_weekdays,
-                    selected_week_types
+            st.session_state["timestamp_filters"] = timestamp_filters
+
+        # Keep the generated timestamps on screen across reruns (e.g. picking another export
+        # format) until one of the inputs changes
+        job = st.session_state.get("export_job")
+        if st.session_state.get("timestamp_filters") == timestamp_filters:
+            format_name = st.session_state.get("export_format", "csv")
+
+            # Exports are memoized per format and normalized filters, so reruns and switching
+            # back to an earlier format reuse the file instead of regenerating it. They run in a
+            # background job that reruns pick up from the session state, replacing (and
+            # cancelling) the job of a previous format
+            key = ("export", format_name, interval_mins, session_spec) + filter_key(
+                start_date, end_date, selected_months, selected_weekdays, selected_week_types
+            )
+            if job is None or job.key != key:
+                if job is not None:
+                    job.cancel()
+                job = st.session_state["export_job"] = ExportJob(
+                    key, estimate.rows, format_name, timestamp_filters, profile_modes=profile_modes
                 )
+                # Cached and small exports finish right away, without showing any progress
+                job.wait(0.1)
 
-            if timestamps:
-                # Create DataFrame
-                df = pd.DataFrame({"OPEN_DATETIME": timestamps})
+            # Poll a running job from a fragment, so that only the progress reruns
+            polling = not job.done
+            st.fragment(show_export, run_every=EXPORT_POLL_SECONDS if polling else None)(
+                job, format_name, timestamp_filters, selected_weekdays_names, polling
+            )
 
-                # Display info
-                st.success(f"Generated {len(timestamps)} timestamps")
-                st.info(f"Date range: {start_date} to {end_date}")
-                st.info(
-                    f"Time range: 9:35 AM to 3:55 PM ({interval_mins}-minute intervals)"
-                )
-
-                # Display filter info
-                if len(selected_months) < 12:
-                    month_names = [
-                        datetime(2023, m, 1).strftime("%B") for m in selected_months
-                    ]
-                    st.info(f"Months: {', '.join(month_names)}")
-
-                if len(selected_weekdays_names) < 7:
-                    st.info(f"Days: {', '.join(selected_weekdays_names)}")
-
-                # Show preview
-                st.subheader("Preview (First 20 rows)")
-                st.dataframe(df.head(20))
-
-                # Download button
-                st.download_button(
-                    label="📥 Download CSV",
-                    data=convert_for_download(df),
-                    file_name=f"timestamps_{start_date}_to_{end_date}_{interval_mins}mins.csv",
-                    mime="text/csv",
-                    help="Download the generated timestamps as a CSV file",
-                )
-
-            else:
-                st.warning("No timestamps generated. Please check your date range.")
+        elif job is not None:
+            # The inputs changed: stop generating the timestamps of the previous ones
+            job.cancel()
+            del st.session_state["export_job"]
 
     with col_gen2:
         if st.button("Dates (ISO format)", icon="📅"):
             with st.spinner("Generating dates..."):
-                timestamps = generate_timestamps(
-                    start_date, end_date, interval_mins, selected_months, selected_weekdays,
-                    selected_week_types
+                sessions = filter_sessions(
+                    start_date, end_date, selected_months, selected_weekdays, selected_week_types
                 )
+                # Days the session rules leave without timestamps (e.g. early closes before the
+                # window starts) are left out, so the dates match the generated timestamps
+                grid = SessionGrid(sessions, interval_mins, session_spec)
+                trading_dates = sessions.days[grid.day_counts > 0]
 
-            if timestamps:
-                # Extract unique dates from timestamps
-                unique_dates = set()
-                for timestamp in timestamps:
-                    date_part = timestamp.split(' ')[0]  # Get date part before space
-                    unique_dates.add(date_part)
-
-                # Sort dates
-                sorted_dates = sorted(list(unique_dates))
-                dates_string = ",".join(sorted_dates)
+            if len(trading_dates):
+                dates_string = ",".join(np.datetime_as_string(trading_dates, unit="D"))
 
-                st.subheader(f"📅 {len(sorted_dates)} dates")
+                st.subheader(f"📅 {len(trading_dates)} dates")
                 st.code(dates_string, language=None, wrap_lines=True)
+                skipped = len(sessions.days) - len(trading_dates)
+                if skipped:
+                    st.caption(
+                        f"{skipped} trading day{'s' if skipped > 1 else ''} without timestamps under the "
+                        f"session rules left out"
+                    )
 
             else:
                 st.warning("No dates generated. Please check your date range.")
 
 
 if __name__ == "__main__":
-    main()
+    # ?profile=spans (or cprofile, tracemalloc, comma separated) profiles the run, as does
+    # the TIMESTAMPS_SMITH_PROFILE environment variable
+    try:
+        profile_modes = parse_profile_modes(st.query_params.get("profile", os.environ.get(PROFILE_ENV)))
+    except ValueError as exc:
+        st.warning(f"Profiling is off: {exc}")
+        profile_modes = None
+    if profile_modes is None:
+        main()
+    else:
+        # st.rerun() raises to restart the script, so the profile is shown from a finally block
+        try:
+            with profile(profile_modes) as report:
+                main(profile_modes)
+        finally:
+            show_profile(report)
@@ -0,0 +1,342 @@
+"""Benchmark suite for the timestamp generation hot paths
+
+Times timestamp, date and short-week generation, formatting and the CSV export over a grid of
+date-range lengths, intervals, calendars and filters, recording the best wall time and the peak
+traced memory of each case. Results are compared against benchmarks/baseline.json:
+
+    python benchmarks/bench.py                 # run and compare against the baseline
+    python benchmarks/bench.py --check         # exit 1 when a case regresses
+    python benchmarks/bench.py --update        # store the results as the new baseline
+    python benchmarks/bench.py -k short_weeks  # only cases whose name contains the text
+
+Calendar schedules are cached per process, so cases run warm unless their name says "cold".
+The on-disk schedule store is disabled so that "cold" cases build the schedules; "disk" cases
+load them from a store in the temporary directory instead.
+Generated results are memoized too; they are cleared before each run except in "cached" cases,
+and "extend" cases start from the result of a range one day shorter.
+Baseline timings are machine dependent; refresh them with --update when changing hosts.
+"""
+
+import argparse
+import io
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from timestamps_smith import (  # noqa: E402
+    ScheduleCache,
+    ScheduleStore,
+    SessionSpec,
+    estimate_timestamps,
+    filter_sessions,
+    format_timestamp_bytes,
+    format_timestamps,
+    generate_calendar_timestamps,
+    generate_epoch_minutes,
+    generate_timestamp_array,
+    generate_timestamp_memmap,
+    generate_trading_dates,
+    get_short_weeks_with_holidays,
+    iter_timestamp_chunks,
+    result_cache,
+    schedule_cache,
+    write_timestamps_csv,
+)
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+END = date(2024, 12, 31)
+SPANS = {
+    "1m": date(2024, 12, 1),
+    "1y": date(2024, 1, 1),
+    "10y": date(2015, 1, 1),
+    "30y": date(1995, 1, 1),
+}
+INTERVALS = (1, 5, 15, 60)
+CALENDARS = ("NYSE", "CME_Equity", "LSE")
+FILTERS = {
+    "months": dict(selected_months=[1, 4, 7, 10]),
+    "weekdays": dict(selected_weekdays=[0, 4]),
+    "short": dict(selected_week_types=["Short weeks"]),
+    "before-short": dict(selected_week_types=["Week before short week", "Regular weeks"]),
+    "all": dict(selected_months=[1, 4, 7, 10], selected_weekdays=[0, 4], selected_week_types=["Short weeks"]),
+}
+
+# Minimum time spent timing a case, and bounds on its number of runs
+MIN_TIME = 0.2
+MIN_RUNS, MAX_RUNS = 3, 50
+
+# Absolute slack on top of the tolerances, so that sub-millisecond cases don't flap
+TIME_SLACK = 0.001
+MEMORY_SLACK = 64 * 1024
+
+Case = namedtuple("Case", ["name", "run", "setup"])
+
+
+def _clear_results():
+    result_cache.cache_clear()
+
+
+def _clear_all():
+    result_cache.cache_clear()
+    schedule_cache.cache_clear()
+
+
+def _no_setup():
+    pass
+
+
+def _previous_day(generate):
+    """Setup caching the result of generate(end) for the day before END, for "extend" cases"""
+    def setup():
+        result_cache.cache_clear()
+        generate(END - timedelta(days=1))
+    return setup
+
+
+def _write_csv(*args, **kwargs):
+    write_timestamps_csv(iter_timestamp_chunks(*args, chunk_rows=65_536, **kwargs), io.BytesIO())
+
+
+def cases():
+    for span, start in SPANS.items():
+        for interval in INTERVALS:
+            yield Case(
+                f"generate[NYSE-{span}-{interval}min]",
+                lambda start=start, interval=interval: generate_timestamp_array(start, END, interval),
+                _clear_results,
+            )
+
+    start = SPANS["10y"]
+    for calendar in CALENDARS:
+        yield Case(
+            f"calendar[{calendar}-10y-5min]",
+            lambda calendar=calendar: generate_timestamp_array(start, END, 5, market_calendar=calendar),
+            _clear_results,
+        )
+        yield Case(
+            f"calendar[{calendar}-10y-5min-cold]",
+            lambda calendar=calendar: generate_timestamp_array(start, END, 5, market_calendar=calendar),
+            _clear_all,
+        )
+
+    session_spec = SessionSpec(entry_delay=1, windows=[("9:30", "15:45")], exclusions=[("12:00", "13:00")])
+    yield Case(
+        "generate[NYSE-10y-5min-session]",
+        lambda: generate_timestamp_array(start, END, 5, session_spec=session_spec),
+        _clear_results,
+    )
+    yield Case(
+        "batch[3-calendars-10y-5min]",
+        lambda: generate_calendar_timestamps(start, END, 5, market_calendars=CALENDARS),
+        _clear_results,
+    )
+    yield Case(
+        "batch[3-calendars-10y-5min-cold]",
+        lambda: generate_calendar_timestamps(start, END, 5, market_calendars=CALENDARS),
+        _clear_all,
+    )
+
+    for name, filters in FILTERS.items():
+        yield Case(
+            f"generate[NYSE-10y-5min-{name}]",
+            lambda filters=filters: generate_timestamp_array(start, END, 5, **filters),
+            _clear_results,
+        )
+
+    for name, filters in FILTERS.items():
+        yield Case(
+            f"filter[NYSE-30y-{name}]",
+            lambda filters=filters: filter_sessions(SPANS["30y"], END, **filters),
+            _clear_results,
+        )
+
+    for span, start in SPANS.items():
+        yield Case(
+            f"dates[NYSE-{span}]",
+            lambda start=start: generate_trading_dates(start, END),
+            _clear_results,
+        )
+    yield Case(
+        "dates[NYSE-30y-all]",
+        lambda: generate_trading_dates(SPANS["30y"], END, **FILTERS["all"]),
+        _clear_results,
+    )
+
+    for interval in (1, 5):
+        yield Case(
+            f"epoch_minutes[NYSE-30y-{interval}min]",
+            lambda interval=interval: generate_epoch_minutes(SPANS["30y"], END, interval),
+            _clear_results,
+        )
+
+    # Sharded generation, against the sequential generate[NYSE-30y-1min] case; the pool is
+    # started anew by every run
+    for shard_months in (12, 60):
+        yield Case(
+            f"shard[NYSE-30y-1min-{shard_months}m]",
+            lambda shard_months=shard_months: generate_timestamp_array(
+                SPANS["30y"], END, 1, shard_months=shard_months
+            ),
+            _clear_results,
+        )
+
+    yield Case(
+        "generate[NYSE-30y-1min-cached]",
+        lambda: generate_timestamp_array(SPANS["30y"], END, 1),
+        _no_setup,
+    )
+    yield Case(
+        "generate[NYSE-30y-1min-extend]",
+        lambda: generate_timestamp_array(SPANS["30y"], END, 1),
+        _previous_day(lambda end: generate_timestamp_array(SPANS["30y"], end, 1)),
+    )
+    yield Case(
+        "dates[NYSE-30y-all-cached]",
+        lambda: generate_trading_dates(SPANS["30y"], END, **FILTERS["all"]),
+        _no_setup,
+    )
+
+    for span, start in SPANS.items():
+        yield Case(
+            f"short_weeks[NYSE-{span}]",
+            lambda start=start: get_short_weeks_with_holidays(start, END),
+            _clear_results,
+        )
+    for calendar in CALENDARS:
+        yield Case(
+            f"short_weeks[{calendar}-30y-cold]",
+            lambda calendar=calendar: get_short_weeks_with_holidays(SPANS["30y"], END, calendar),
+            _clear_all,
+        )
+
+    # A new cache per run, so that every run misses memory; the warm-up run fills the store
+    store = ScheduleStore(Path(tempfile.gettempdir()) / "timestamps-smith-bench")
+    for calendar in CALENDARS:
+        yield Case(
+            f"schedule[{calendar}-30y-cold]",
+            lambda calendar=calendar: ScheduleCache().sessions(calendar, SPANS["30y"], END),
+            _no_setup,
+        )
+        yield Case(
+            f"schedule[{calendar}-30y-disk]",
+            lambda calendar=calendar: ScheduleCache(store=store).sessions(calendar, SPANS["30y"], END),
+            _no_setup,
+        )
+
+    for interval in (1, 5):
+        yield Case(
+            f"export_csv[NYSE-10y-{interval}min]",
+            lambda interval=interval: _write_csv(SPANS["10y"], END, interval),
+            _clear_results,
+        )
+
+    for name, filters in (("", {}), ("-all", FILTERS["all"])):
+        yield Case(
+            f"estimate[NYSE-30y-1min{name}]",
+            lambda filters=filters: estimate_timestamps(SPANS["30y"], END, 1, **filters),
+            _no_setup,
+        )
+
+    memmap_path = Path(tempfile.gettempdir()) / "timestamps-smith-bench.memmap"
+    for layout in ("records", "epoch_minutes"):
+        yield Case(
+            f"memmap[NYSE-30y-1min-{layout}]",
+            lambda layout=layout: generate_timestamp_memmap(memmap_path, SPANS["30y"], END, 1, layout=layout),
+            _clear_results,
+        )
+
+    timestamps = generate_timestamp_array(SPANS["10y"], END, 5)
+    yield Case("format[NYSE-10y-5min-strings]", lambda: format_timestamps(timestamps), _no_setup)
+    yield Case("format[NYSE-10y-5min-bytes]", lambda: format_timestamp_bytes(timestamps), _no_setup)
+
+
+def measure(case):
+    """Best wall time over several runs and peak traced memory of a single run, in seconds and bytes"""
+    # Warm-up run, which also primes the calendar caches for the warm cases
+    case.setup()
+    case.run()
+
+    best, spent, runs = float("inf"), 0.0, 0
+    while runs < MIN_RUNS or (spent < MIN_TIME and runs < MAX_RUNS):
+        case.setup()
+        start = time.perf_counter()
+        case.run()
+        elapsed = time.perf_counter() - start
+        best, spent, runs = min(best, elapsed), spent + elapsed, runs + 1
+
+    case.setup()
+    tracemalloc.start()
+    try:
+        case.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return best, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="keyword", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 when a case regresses")
+    parser.add_argument("--update", action="store_true", help="write the results to the baseline file")
+    parser.add_argument(
+        "--time-tolerance", type=float, default=1.5, help="allowed time ratio over the baseline (default: 1.5)"
+    )
+    parser.add_argument(
+        "--memory-tolerance", type=float, default=1.2, help="allowed peak memory ratio over the baseline (default: 1.2)"
+    )
+    args = parser.parse_args(argv)
+    schedule_cache.store = None
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    results = {}
+    regressions = 0
+
+    print(f"{'case':<40} {'time ms':>10} {'base ms':>10} {'peak MiB':>10} {'base MiB':>10}")
+    for case in cases():
+        if args.keyword not in case.name:
+            continue
+
+        elapsed, peak = measure(case)
+        results[case.name] = {"time": round(elapsed, 6), "peak_memory": peak}
+
+        base = baseline.get(case.name)
+        status = ""
+        if base:
+            slower = elapsed > base["time"] * args.time_tolerance + TIME_SLACK
+            bigger = peak > base["peak_memory"] * args.memory_tolerance + MEMORY_SLACK
+            if slower or bigger:
+                regressions += 1
+                status = "REGRESSION (" + ", ".join(
+                    label for label, hit in (("time", slower), ("memory", bigger)) if hit
+                ) + ")"
+
+        print(
+            f"{case.name:<40} {elapsed * 1000:10.2f} "
+            f"{base['time'] * 1000 if base else float('nan'):10.2f} "
+            f"{peak / 2**20:10.2f} "
+            f"{base['peak_memory'] / 2**20 if base else float('nan'):10.2f}  {status}"
+        )
+
+    if args.update:
+        baseline.update(results)
+        BASELINE.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + "\n")
+        print(f"Updated {BASELINE.name} with {len(results)} cases")
+
+    if regressions:
+        print(f"{regressions} case(s) regressed against the baseline")
+        return 1 if args.check else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
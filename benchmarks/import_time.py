@@ -0,0 +1,79 @@
+"""Import-time guard for the timestamps_smith package
+
+Imports each module in a fresh interpreter, reports the best of a few runs and fails when a
+module goes over its time budget or loads a heavy dependency that it is supposed to defer.
+Run it from the repository root:
+
+    python benchmarks/import_time.py [--repeat N]
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ("numpy", "pandas", "pandas_market_calendars", "pyarrow", "streamlit")
+
+# module -> (import time budget in seconds, heavy dependencies it may load)
+BUDGETS = {
+    "timestamps_smith": (0.02, ()),
+    "timestamps_smith.cli": (0.05, ()),
+    "timestamps_smith.engine": (0.25, ("numpy",)),
+    "timestamps_smith.export": (0.25, ("numpy",)),
+    "timestamps_smith.profiling": (0.02, ()),
+}
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def measure(module, repeat):
+    """Best import time of a module over fresh interpreters, and the heavy modules it loaded"""
+    best, loaded = None, set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        elapsed, modules = result.stdout.splitlines()
+        best = float(elapsed) if best is None else min(best, float(elapsed))
+        loaded.update(filter(None, modules.split(",")))
+    return best, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module (default: 5)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for module, (budget, allowed) in BUDGETS.items():
+        elapsed, loaded = measure(module, args.repeat)
+        unexpected = sorted(loaded - set(allowed))
+
+        problems = []
+        if elapsed > budget:
+            problems.append(f"over the {budget * 1000:.0f} ms budget")
+        if unexpected:
+            problems.append(f"imports {', '.join(unexpected)}")
+        failures += bool(problems)
+
+        status = "FAIL " + "; ".join(problems) if problems else "ok"
+        print(f"{module:<28} {elapsed * 1000:8.1f} ms  {status}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
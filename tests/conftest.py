@@ -0,0 +1,21 @@
+"""Shared fixtures: schedules are built with the calendar library, never read from the user's disk cache"""
+
+import os
+
+import pytest
+
+from timestamps_smith import schedule_cache
+
+
+@pytest.fixture(autouse=True, scope="session")
+def no_schedule_store():
+    # The environment variable disables the store of worker processes too
+    environ = os.environ.get("TIMESTAMPS_SMITH_CACHE_DIR")
+    os.environ["TIMESTAMPS_SMITH_CACHE_DIR"] = ""
+    store, schedule_cache.store = schedule_cache.store, None
+    yield
+    schedule_cache.store = store
+    if environ is None:
+        del os.environ["TIMESTAMPS_SMITH_CACHE_DIR"]
+    else:
+        os.environ["TIMESTAMPS_SMITH_CACHE_DIR"] = environ
@@ -0,0 +1,139 @@
+"""Short weeks, week types and the schedule store of timestamps_smith.calendars"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from timestamps_smith import ScheduleCache, ScheduleStore, get_short_weeks_with_holidays
+
+
+def short_week(week_start, trading_dates, holidays):
+    """Short week record as returned by get_short_weeks_with_holidays"""
+    week_start = date.fromisoformat(week_start)
+    return {
+        "week_start": week_start,
+        "week_end": week_start + timedelta(days=4),
+        "trading_days": 4,
+        "trading_dates": [date.fromisoformat(day) for day in trading_dates],
+        "holidays": [np.datetime64(holiday) for holiday in holidays],
+    }
+
+
+# Output of the original app.py implementation, which the rewrites must reproduce exactly
+BASELINE_SHORT_WEEKS = {
+    # Year boundary: Christmas and New Year's Day weeks
+    ("2023-12-18", "2024-01-12"): [
+        short_week("2023-12-25", ["2023-12-26", "2023-12-27", "2023-12-28", "2023-12-29"], ["2023-12-25"]),
+        short_week("2024-01-01", ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"], ["2024-01-01"]),
+    ],
+    # A week spilling into the next year, cut by the range on both sides
+    ("2024-12-31", "2025-01-02"): [
+        short_week("2024-12-30", ["2024-12-31", "2025-01-02"], ["2025-01-01"]),
+    ],
+    # Single days: the trading dates are those of the range, the trading days the whole week's
+    ("2024-07-03", "2024-07-03"): [
+        short_week("2024-07-01", ["2024-07-03"], ["2024-07-04"]),
+    ],
+    ("2024-07-06", "2024-07-06"): [],
+    # Range starting mid-week, before Thanksgiving
+    ("2024-11-20", "2024-12-06"): [
+        short_week("2024-11-25", ["2024-11-25", "2024-11-26", "2024-11-27", "2024-11-29"], ["2024-11-28"]),
+    ],
+}
+
+
+@pytest.mark.parametrize("start_date, end_date", list(BASELINE_SHORT_WEEKS))
+def test_short_weeks_match_baseline(start_date, end_date):
+    short_weeks = get_short_weeks_with_holidays(date.fromisoformat(start_date), date.fromisoformat(end_date))
+    assert short_weeks == BASELINE_SHORT_WEEKS[start_date, end_date]
+
+
+def test_short_weeks_of_a_year():
+    short_weeks = get_short_weeks_with_holidays(date(2024, 1, 1), date(2024, 12, 31))
+    assert [week["week_start"].isoformat() for week in short_weeks] == [
+        "2024-01-01", "2024-01-15", "2024-02-19", "2024-03-25", "2024-05-27", "2024-06-17",
+        "2024-07-01", "2024-09-02", "2024-11-25", "2024-12-23", "2024-12-30",
+    ]
+    assert short_weeks[-1] == short_week("2024-12-30", ["2024-12-30", "2024-12-31"], ["2025-01-01"])
+
+
+def stored_files(store):
+    return sorted(path.name for path in store.directory.iterdir())
+
+
+def test_store_is_wiped_on_library_upgrade(tmp_path, monkeypatch):
+    monkeypatch.setattr("importlib.metadata.version", lambda name: "1.0")
+    ScheduleCache(store=ScheduleStore(tmp_path)).sessions("NYSE", date(2024, 1, 1), date(2024, 1, 31))
+    assert [path.name for path in tmp_path.iterdir()] == ["pandas_market_calendars-1.0"]
+
+    monkeypatch.setattr("importlib.metadata.version", lambda name: "2.0")
+    store = ScheduleStore(tmp_path)
+    assert not store.has("NYSE")
+    assert [path.name for path in tmp_path.iterdir()] == []
+
+
+def test_wider_range_replaces_stored_range(tmp_path):
+    store = ScheduleStore(tmp_path)
+    ScheduleCache(store=store).sessions("NYSE", date(2024, 3, 4), date(2024, 3, 29))
+    assert stored_files(store) == ["NYSE.2024-03-04.2024-03-31.npy"]
+
+    ScheduleCache(store=store).sessions("NYSE", date(2024, 1, 1), date(2024, 12, 31))
+    assert stored_files(store) == ["NYSE.2024-01-01.2025-01-05.npy"]
+
+    # Narrower ranges are loaded from the wider file, without saving another one
+    ScheduleCache(store=store).sessions("NYSE", date(2024, 3, 4), date(2024, 3, 29))
+    assert stored_files(store) == ["NYSE.2024-01-01.2025-01-05.npy"]
+
+
+def test_warm_store_matches_cold_build(tmp_path):
+    start_date, end_date = date(2023, 12, 18), date(2024, 12, 31)
+    cold_cache = ScheduleCache()
+    cold = cold_cache.sessions("NYSE", start_date, end_date)
+
+    store = ScheduleStore(tmp_path)
+    ScheduleCache(store=store).week_index("NYSE", start_date, end_date)
+    warm_cache = ScheduleCache(store=store)
+    warm = warm_cache.sessions("NYSE", start_date, end_date)
+
+    assert warm_cache._entries["NYSE"].calendar is None  # loaded without the calendar library
+    for warm_column, cold_column in zip(warm, cold):
+        assert warm_column.dtype == cold_column.dtype
+        np.testing.assert_array_equal(warm_column, cold_column)
+    np.testing.assert_array_equal(warm_cache.holidays("NYSE"), cold_cache.holidays("NYSE"))
+
+    days = cold.days
+    np.testing.assert_array_equal(
+        warm_cache.week_index("NYSE", start_date, end_date).week_types(days),
+        cold_cache.week_index("NYSE", start_date, end_date).week_types(days),
+    )
+
+
+def test_schedule_cache_evicts_least_recently_used():
+    cache = ScheduleCache(maxsize=2)
+    january = (date(2024, 1, 1), date(2024, 1, 31))
+    cache.sessions("NYSE", *january)
+    cache.sessions("LSE", *january)
+    cache.sessions("NYSE", date(2024, 1, 8), date(2024, 1, 12))  # sliced out of the cached sessions
+    assert cache.cache_info() == (1, 2, 2, 2)
+
+    cache.sessions("CME_Equity", *january)  # evicts LSE, used less recently than NYSE
+    assert cache.cache_info() == (1, 3, 2, 2)
+    cache.sessions("NYSE", *january)
+    assert cache.cache_info() == (2, 3, 2, 2)
+    cache.sessions("LSE", *january)
+    assert cache.cache_info() == (2, 4, 2, 2)
+
+    # A wider range than the cached one is a miss, and shrinking maxsize evicts at once
+    cache.sessions("LSE", date(2023, 12, 1), date(2024, 1, 31))
+    assert cache.cache_info() == (2, 5, 2, 2)
+    cache.maxsize = 1
+    assert cache.cache_info().currsize == 1
+
+    cache.cache_clear()
+    assert cache.cache_info() == (0, 0, 1, 0)
+
+
+def test_schedule_cache_rejects_unknown_calendar():
+    with pytest.raises(ValueError, match="unknown market calendar"):
+        ScheduleCache().sessions("NOPE", date(2024, 1, 1), date(2024, 1, 31))
@@ -0,0 +1,91 @@
+"""The timestamps-smith command line, driven through main()"""
+
+import pytest
+
+from timestamps_smith.cli import main
+
+
+def run_cli(capsys, *argv):
+    """Exit code, stdout and stderr of a command line"""
+    try:
+        code = main(list(argv))
+    except SystemExit as exc:
+        code = exc.code
+    out, err = capsys.readouterr()
+    return code, out, err
+
+
+def test_timestamps_csv(capsys):
+    code, out, _ = run_cli(capsys, "timestamps", "2024-11-29", "2024-11-29", "--interval", "30")
+    assert code == 0
+    lines = out.splitlines()
+    assert lines[0] == "OPEN_DATETIME"
+    assert (lines[1], lines[-1]) == ("2024-11-29 09:32", "2024-11-29 12:32")
+
+
+def test_estimate_matches_output(capsys):
+    argv = ["timestamps", "2024-01-01", "2024-01-31", "--interval", "15"]
+    _, out, _ = run_cli(capsys, *argv)
+    code, estimate, _ = run_cli(capsys, *argv, "--estimate")
+    assert code == 0
+    rows = len(out.splitlines()) - 1
+    assert estimate == f"{rows} timestamps on 21 trading days, {len(out.encode())} bytes as csv\n"
+
+
+def test_max_rows_refusal(capsys):
+    argv = ["timestamps", "2024-01-01", "2024-01-31", "--interval", "1"]
+    code, out, err = run_cli(capsys, *argv, "--max-rows", "1000")
+    assert code == 2
+    assert out == ""
+    assert "exceed the --max-rows limit of 1,000" in err
+
+    code, out, _ = run_cli(capsys, "timestamps", "2024-01-02", "2024-01-02", "--interval=1", "--max-rows=0")
+    assert code == 0
+    assert len(out.splitlines()) == 1 + 388
+
+
+def test_epoch_minutes_needs_output_file(capsys):
+    code, out, err = run_cli(capsys, "timestamps", "2024-01-01", "2024-01-31", "--format", "epoch-minutes")
+    assert code == 2
+    assert out == ""
+    assert "--format epoch-minutes needs an output file (-o)" in err
+
+
+def test_unknown_calendar(capsys):
+    code, _, err = run_cli(capsys, "dates", "2024-01-01", "2024-01-31", "--calendar", "NOPE")
+    assert code == 2
+    assert "unknown market calendar 'NOPE'" in err
+
+
+@pytest.mark.parametrize(
+    "argv, message",
+    [
+        (["dates", "2024-02-01", "2024-01-01"], "start date must be before or equal to end date"),
+        (["timestamps", "2024-01-01", "2024-01-31", "--interval", "0"], "--interval must be a positive"),
+        (["timestamps", "2024-01-01", "2024-01-05", "--entry-delay", "-5"], "must be non-negative"),
+        (["timestamps", "2024-01-01", "2024-01-05", "--close-margin=-1"], "must be non-negative"),
+        (["dates", "2024-01-01", "2024-01-31", "--weekdays", "mon,xyz"], "invalid choice: 'xyz'"),
+        (["dates", "2024-01-01", "2024-01-31", "--week-types", "long"], "invalid week type: 'long'"),
+    ],
+)
+def test_invalid_arguments(capsys, argv, message):
+    code, _, err = run_cli(capsys, *argv)
+    assert code == 2
+    assert message in err
+
+
+def test_weekend_days_of_a_round_the_clock_calendar(capsys):
+    code, out, _ = run_cli(
+        capsys, "dates", "2024-01-01", "2024-01-14", "--calendar", "24/7", "--weekdays", "sat,6"
+    )
+    assert code == 0
+    assert out.split() == ["2024-01-06", "2024-01-07", "2024-01-13", "2024-01-14"]
+
+
+def test_short_weeks(capsys):
+    code, out, _ = run_cli(capsys, "short-weeks", "2024-11-25", "2024-11-29")
+    assert code == 0
+    assert out.splitlines() == [
+        "week_start,week_end,trading_days,trading_dates,holidays",
+        "2024-11-25,2024-11-29,4,2024-11-25 2024-11-26 2024-11-27 2024-11-29,2024-11-28",
+    ]
@@ -0,0 +1,301 @@
+"""Filtering, caching and sharding of timestamps_smith.engine"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from timestamps_smith import (
+    MEMMAP_LAYOUTS,
+    ResultCache,
+    SessionSpec,
+    format_timestamps,
+    generate_timestamp_array,
+    generate_timestamp_memmap,
+    generate_timestamps,
+    generate_trading_dates,
+    result_cache,
+)
+
+
+def iso_dates(trading_dates):
+    return list(np.datetime_as_string(trading_dates, unit="D"))
+
+
+def minutes(timestamps):
+    """"HH:MM" of each timestamp"""
+    return [timestamp[11:] for timestamp in format_timestamps(timestamps)]
+
+
+def test_regular_session_grid():
+    timestamps = generate_timestamp_array(date(2024, 11, 27), date(2024, 11, 27), 1)
+    assert len(timestamps) == 388
+    assert (minutes(timestamps[:1]), minutes(timestamps[-1:])) == (["09:32"], ["15:59"])
+
+
+def test_early_close_grid():
+    # NYSE closes at 13:00 the day after Thanksgiving
+    timestamps = generate_timestamp_array(date(2024, 11, 29), date(2024, 11, 29), 1)
+    assert len(timestamps) == 208
+    assert (minutes(timestamps[:1]), minutes(timestamps[-1:])) == (["09:32"], ["12:59"])
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_grid_skips_the_lunch_break():
+    # HKEX breaks from 12:00 to 13:00; the grid restarts from the afternoon open
+    timestamps = generate_timestamp_array(date(2024, 1, 2), date(2024, 1, 2), 30, market_calendar="XHKG")
+    assert minutes(timestamps) == [
+        "09:32", "10:02", "10:32", "11:02", "11:32", "13:02", "13:32", "14:02", "14:32", "15:02", "15:32"
+    ]
+
+
+def clock(offsets):
+    """"HH:MM" of minute offsets from midnight, with a day prefix for the previous and next day"""
+    return [
+        f"{'-' if offset < 0 else '+' if offset >= 1440 else ''}{offset % 1440 // 60:02d}:{offset % 60:02d}"
+        for offset in offsets
+    ]
+
+
+@pytest.mark.parametrize(
+    "session_spec, interval, session, expected",
+    [
+        # A window keeps both its ends, an exclusion drops its start but keeps its end
+        (
+            SessionSpec(entry_delay=1, windows=[("9:30", "15:45")], exclusions=[("12:00", "13:01")]),
+            30,
+            (570, 960),
+            [
+                "09:31", "10:01", "10:31", "11:01", "11:31", "13:01", "13:31", "14:01", "14:31", "15:01",
+                "15:31",
+            ],
+        ),
+        (
+            SessionSpec(windows=[("9:30", "10:02"), ("15:00", "16:00")]),
+            30,
+            (570, 960),
+            ["09:32", "10:02", "15:02", "15:32"],
+        ),
+        (SessionSpec(close_margin=0, windows=[("15:00", "16:00")]), 30, (570, 960), ["15:02", "15:32"]),
+        # A window or exclusion ending before it starts wraps past midnight, on both days
+        (
+            SessionSpec(entry_delay=0, close_margin=0, windows=[("22:00", "02:00")]),
+            60,
+            (0, 1440),
+            ["00:00", "01:00", "02:00", "22:00", "23:00", "+00:00"],
+        ),
+        (
+            SessionSpec(entry_delay=0, close_margin=0, exclusions=[("20:00", "04:00")]),
+            120,
+            (0, 1440),
+            ["04:00", "06:00", "08:00", "10:00", "12:00", "14:00", "16:00", "18:00"],
+        ),
+        # An overnight session opening at 18:00 the day before
+        (
+            SessionSpec(entry_delay=0, windows=[("20:00", "08:00")]),
+            120,
+            (-360, 960),
+            ["-20:00", "-22:00", "00:00", "02:00", "04:00", "06:00", "08:00"],
+        ),
+    ],
+)
+def test_session_spec_windows_and_exclusions(session_spec, interval, session, expected):
+    assert clock(session_spec.offsets(interval, *session)) == expected
+
+
+def test_session_spec_skips_the_calendar_break():
+    offsets = SessionSpec().offsets(30, 570, 960, break_start=720, break_end=780)
+    assert clock(offsets) == [
+        "09:32", "10:02", "10:32", "11:02", "11:32", "13:02", "13:32", "14:02", "14:32", "15:02", "15:32"
+    ]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(entry_delay=-5),
+        dict(close_margin=-1),
+        dict(windows=[("9:30", "25:00")]),
+        dict(exclusions=[(-1, 60)]),
+    ],
+)
+def test_session_spec_rejects_invalid_rules(kwargs):
+    with pytest.raises(ValueError):
+        SessionSpec(**kwargs)
+
+
+def test_window_after_an_early_close_leaves_no_timestamps():
+    session_spec = SessionSpec(windows=[("14:00", "15:55")])
+    timestamps = generate_timestamp_array(
+        date(2024, 11, 27), date(2024, 11, 29), 60, session_spec=session_spec
+    )
+    assert format_timestamps(timestamps) == ["2024-11-27 14:32", "2024-11-27 15:32"]
+
+
+WEEK_OF_2024_05_20 = ["2024-05-20", "2024-05-21", "2024-05-22", "2024-05-23", "2024-05-24"]
+
+
+@pytest.mark.parametrize(
+    "start_date, end_date, week_type, expected",
+    [
+        # The week before Memorial Day is a week before short week, although the range ends first
+        (date(2024, 5, 20), date(2024, 5, 24), "Week before short week", WEEK_OF_2024_05_20),
+        (date(2024, 5, 20), date(2024, 5, 24), "Regular weeks", []),
+        (date(2024, 5, 20), date(2024, 5, 24), "Short weeks", []),
+        # New Year's week is short, and precedes the closure of 2025-01-09
+        (date(2024, 12, 30), date(2024, 12, 31), "Short weeks", ["2024-12-30", "2024-12-31"]),
+        (date(2024, 12, 30), date(2024, 12, 31), "Week before short week", ["2024-12-30", "2024-12-31"]),
+        (date(2024, 12, 30), date(2024, 12, 31), "Regular weeks", []),
+    ],
+)
+def test_week_types_follow_the_full_calendar(start_date, end_date, week_type, expected):
+    trading_dates = generate_trading_dates(start_date, end_date, selected_week_types=[week_type])
+    assert iso_dates(trading_dates) == expected
+
+
+@pytest.mark.parametrize("week_type", ["Short weeks", "Week before short week", "Regular weeks"])
+def test_week_types_do_not_depend_on_the_range(week_type):
+    year = generate_trading_dates(date(2024, 1, 1), date(2024, 12, 31), selected_week_types=[week_type])
+    for month in range(1, 13):
+        start, end = date(2024, month, 1), date(2024, month, 28)
+        days = year[(year >= np.datetime64(start)) & (year <= np.datetime64(end))]
+        trading_dates = generate_trading_dates(start, end, selected_week_types=[week_type])
+        assert iso_dates(trading_dates) == iso_dates(days)
+
+
+WEEK_TYPE_FILTERS = [None, ["Short weeks"], ["Week before short week"], ["Regular weeks"]]
+
+
+@pytest.mark.parametrize("week_types", WEEK_TYPE_FILTERS)
+@pytest.mark.parametrize(
+    "cached_range, requested_range",
+    [
+        # Extended at the end, past the early close of 2024-11-29
+        ((date(2024, 11, 1), date(2024, 11, 29)), (date(2024, 11, 1), date(2024, 12, 31))),
+        # Extended at the start, before the early close of 2024-12-24
+        ((date(2024, 12, 24), date(2025, 1, 31)), (date(2024, 11, 1), date(2025, 1, 31))),
+        # Extended at both ends
+        ((date(2024, 11, 29), date(2024, 12, 24)), (date(2024, 11, 1), date(2025, 1, 31))),
+    ],
+)
+def test_extended_range_matches_recompute(cached_range, requested_range, week_types):
+    result_cache.cache_clear()
+    generate_trading_dates(*cached_range, selected_week_types=week_types)
+    generate_timestamp_array(*cached_range, 30, selected_week_types=week_types)
+    extended_dates = generate_trading_dates(*requested_range, selected_week_types=week_types)
+    extended = generate_timestamp_array(*requested_range, 30, selected_week_types=week_types)
+
+    result_cache.cache_clear()
+    assert iso_dates(extended_dates) == iso_dates(
+        generate_trading_dates(*requested_range, selected_week_types=week_types)
+    )
+    np.testing.assert_array_equal(
+        extended, generate_timestamp_array(*requested_range, 30, selected_week_types=week_types)
+    )
+
+
+@pytest.mark.parametrize("shard_months", [1, 3, 12])
+@pytest.mark.parametrize("week_types", [None, ["Week before short week"], ["Regular weeks"]])
+def test_sharded_generation_matches_sequential(shard_months, week_types):
+    # Shards start on the 1st of the month, mid-week, e.g. in the week of 2019-12-30 split
+    # across two years
+    start_date, end_date = date(2019, 12, 15), date(2021, 1, 20)
+    result_cache.cache_clear()
+    sequential = generate_timestamp_array(start_date, end_date, 60, selected_week_types=week_types)
+
+    result_cache.cache_clear()
+    sharded = generate_timestamp_array(
+        start_date, end_date, 60, selected_week_types=week_types, shard_months=shard_months, max_workers=2
+    )
+    np.testing.assert_array_equal(sharded, sequential)
+
+
+def computed(value):
+    """compute() of a ResultCache entry returning value, recording each call"""
+    def compute():
+        compute.calls += 1
+        return value
+    compute.calls = 0
+    return compute
+
+
+def test_result_cache_counts_hits_and_misses():
+    cache = ResultCache(maxbytes=1000)
+    compute = computed(np.arange(10, dtype=np.int64))
+    first = cache.get("a", compute)
+    assert cache.get("a", compute) is first
+    assert compute.calls == 1
+    assert cache.cache_info() == (1, 1, 1000, 80)
+
+    cache.cache_clear()
+    assert cache.cache_info() == (0, 0, 1000, 0)
+    cache.get("a", compute)
+    assert compute.calls == 2
+
+
+def test_result_cache_evicts_least_recently_used_bytes():
+    cache = ResultCache(maxbytes=200)
+    for key in "abc":
+        cache.get(key, computed(np.zeros(8, dtype=np.int64)))  # 64 bytes each
+    cache.get("a", computed(None))  # a is now the most recently used
+    cache.get("d", computed(b"x" * 64))
+    assert cache.cache_info().currsize == 192
+
+    # b was evicted, a and the others stayed
+    for key, cached in [("a", True), ("c", True), ("d", True), ("b", False)]:
+        compute = computed(np.zeros(8, dtype=np.int64))
+        cache.get(key, compute)
+        assert compute.calls == (0 if cached else 1), key
+
+    cache.maxbytes = 64
+    assert cache.cache_info().currsize == 64
+
+
+def test_result_cache_skips_values_larger_than_maxbytes():
+    cache = ResultCache(maxbytes=100)
+    cache.get("small", computed(np.zeros(10, dtype=np.int8)))
+    compute = computed((np.zeros(10, dtype=np.int64), b"x" * 50))  # tuples count every part
+    assert len(cache.get("large", compute)[1]) == 50
+    cache.get("large", compute)
+    assert compute.calls == 2
+    assert cache.cache_info().currsize == 10
+
+
+def test_result_cache_values_are_read_only():
+    cache = ResultCache()
+    timestamps, offsets = cache.get("a", computed((np.arange(3), np.arange(2))))
+    for array in (timestamps, offsets, generate_timestamp_array(date(2024, 1, 2), date(2024, 1, 2), 30)):
+        with pytest.raises(ValueError, match="read-only"):
+            array[0] = 0
+
+
+@pytest.mark.parametrize(
+    "start_date, end_date, interval",
+    [
+        (date(2024, 1, 1), date(2024, 12, 31), 1),  # several chunks
+        (date(2024, 11, 25), date(2024, 11, 29), 30),
+        (date(2024, 7, 6), date(2024, 7, 7), 5),  # a weekend, no timestamps
+    ],
+)
+def test_memmap_round_trip(tmp_path, start_date, end_date, interval):
+    expected = generate_timestamps(start_date, end_date, interval, selected_weekdays=[0, 2, 4])
+
+    path = tmp_path / "records"
+    records = generate_timestamp_memmap(path, start_date, end_date, interval, selected_weekdays=[0, 2, 4])
+    assert path.read_bytes() == "".join(f"{timestamp}\n" for timestamp in expected).encode()
+    assert records["timestamp"].astype("U16").tolist() == expected
+
+    path = tmp_path / "epoch_minutes"
+    minutes = generate_timestamp_memmap(
+        path, start_date, end_date, interval, selected_weekdays=[0, 2, 4], layout="epoch_minutes"
+    )
+    assert path.stat().st_size == len(expected) * 8
+    assert format_timestamps(minutes.view("datetime64[m]")) == expected
+    if expected:
+        mapped = np.memmap(path, MEMMAP_LAYOUTS["epoch_minutes"], "r")
+        assert format_timestamps(mapped.view("datetime64[m]")) == expected
+
+
+def test_memmap_rejects_unknown_layout(tmp_path):
+    with pytest.raises(ValueError, match="unknown memmap layout"):
+        generate_timestamp_memmap(tmp_path / "out", date(2024, 1, 2), date(2024, 1, 2), 5, layout="csv")
@@ -0,0 +1,127 @@
+"""Output of the timestamps_smith.export writers: CSV against pandas, columnar files read back with pyarrow"""
+
+import io
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from timestamps_smith import (
+    DATE_COLUMN,
+    EXPORT_FORMATS,
+    TIMESTAMP_COLUMN,
+    TIMESTAMP_FORMAT,
+    generate_epoch_minutes,
+    generate_timestamp_array,
+    write_timestamps_csv,
+)
+
+
+def pandas_csv(timestamps):
+    formatted = pd.to_datetime(timestamps).strftime(TIMESTAMP_FORMAT)
+    return pd.DataFrame({TIMESTAMP_COLUMN: formatted}).to_csv(index=False).encode()
+
+
+@pytest.mark.parametrize("generate", [generate_timestamp_array, generate_epoch_minutes])
+@pytest.mark.parametrize("chunk_rows", [1, 7, 1000, None])
+def test_csv_matches_pandas(generate, chunk_rows):
+    # Spans a year boundary and the early closes of 2024-11-29 and 2024-12-24
+    timestamps = generate(date(2024, 11, 25), date(2025, 1, 10), 15)
+    chunks = [timestamps] if chunk_rows is None else [
+        timestamps[row:row + chunk_rows] for row in range(0, len(timestamps), chunk_rows)
+    ]
+
+    out = io.BytesIO()
+    assert write_timestamps_csv(chunks, out) == len(timestamps)
+    expected = pandas_csv(timestamps.astype("datetime64[m]").astype("datetime64[ns]"))
+    assert out.getvalue() == expected
+
+
+def test_empty_csv_matches_pandas():
+    out = io.BytesIO()
+    assert write_timestamps_csv([np.array([], dtype=np.int32)], out) == 0
+    assert out.getvalue() == pandas_csv(np.array([], dtype="datetime64[ns]"))
+
+
+def read_columnar(format_name, data):
+    """pyarrow Table of a Parquet, Arrow IPC or Feather export"""
+    pa = pytest.importorskip("pyarrow")
+    if format_name == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(pa.BufferReader(data))
+    if format_name == "arrow":
+        return pa.ipc.open_stream(data).read_all()
+
+    import pyarrow.feather as feather
+
+    return feather.read_table(pa.BufferReader(data))
+
+
+@pytest.mark.parametrize("format_name", ["parquet", "arrow", "feather"])
+@pytest.mark.parametrize("generate", [generate_timestamp_array, generate_epoch_minutes])
+def test_columnar_round_trip(format_name, generate):
+    pytest.importorskip("pyarrow")
+    timestamps = generate(date(2024, 11, 25), date(2025, 1, 10), 15)
+    chunks = [timestamps[row:row + 100] for row in range(0, len(timestamps), 100)]
+
+    out = io.BytesIO()
+    assert EXPORT_FORMATS[format_name].write(chunks, out) == len(timestamps)
+    table = read_columnar(format_name, out.getvalue())
+    assert table.column_names == [TIMESTAMP_COLUMN, DATE_COLUMN]
+    if format_name == "parquet":
+        import pyarrow.parquet as pq
+
+        assert pq.ParquetFile(io.BytesIO(out.getvalue())).num_row_groups == len(chunks)
+
+    expected = timestamps.astype("datetime64[m]")
+    np.testing.assert_array_equal(table[TIMESTAMP_COLUMN].to_numpy(), expected.astype("datetime64[s]"))
+    np.testing.assert_array_equal(table[DATE_COLUMN].to_numpy(), expected.astype("datetime64[D]"))
+
+
+@pytest.mark.parametrize("format_name", ["parquet", "arrow", "feather"])
+def test_columnar_without_date_column(format_name):
+    pytest.importorskip("pyarrow")
+    timestamps = generate_timestamp_array(date(2024, 1, 2), date(2024, 1, 2), 60)
+
+    out = io.BytesIO()
+    EXPORT_FORMATS[format_name].write([timestamps], out, date_column=False)
+    table = read_columnar(format_name, out.getvalue())
+    assert table.column_names == [TIMESTAMP_COLUMN]
+    np.testing.assert_array_equal(table[TIMESTAMP_COLUMN].to_numpy(), timestamps.astype("datetime64[s]"))
+
+
+@pytest.mark.parametrize("format_name", ["parquet", "arrow", "feather"])
+def test_empty_columnar_export(format_name):
+    pytest.importorskip("pyarrow")
+    out = io.BytesIO()
+    assert EXPORT_FORMATS[format_name].write([np.array([], dtype="datetime64[m]")], out) == 0
+    table = read_columnar(format_name, out.getvalue())
+    assert (table.num_rows, table.column_names) == (0, [TIMESTAMP_COLUMN, DATE_COLUMN])
+
+
+@pytest.mark.parametrize("format_name", list(EXPORT_FORMATS))
+@pytest.mark.parametrize(
+    "start_date, end_date, interval, chunk_rows",
+    [
+        (date(2024, 7, 6), date(2024, 7, 7), 5, 1000),  # no timestamps
+        (date(2024, 1, 2), date(2024, 1, 2), 60, 1000),
+        (date(2024, 11, 25), date(2024, 12, 31), 15, 100),
+        (date(2024, 1, 1), date(2024, 12, 31), 1, 65_536),
+    ],
+)
+def test_export_size_matches_output(format_name, start_date, end_date, interval, chunk_rows):
+    export_format = EXPORT_FORMATS[format_name]
+    if format_name != "csv":
+        pytest.importorskip("pyarrow")
+    timestamps = generate_timestamp_array(start_date, end_date, interval)
+    chunks = [timestamps[row:row + chunk_rows] for row in range(0, len(timestamps), chunk_rows)]
+
+    out = io.BytesIO()
+    export_format.write(chunks, out)
+    size = export_format.size(len(timestamps), chunk_rows)
+    if export_format.exact_size:
+        assert size == len(out.getvalue())
+    else:
+        assert size == pytest.approx(len(out.getvalue()), rel=0.05, abs=64)
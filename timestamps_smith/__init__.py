@@ -0,0 +1,78 @@
+"""Timestamps Smith: trading-day timestamp grids for Option Omega backtesting
+
+The public names below are resolved on first access, so ``import timestamps_smith`` (and the
+command line entry point) load no submodule and none of the heavy dependencies until a name is
+actually used.
+"""
+
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    "SHORT_WEEK": "calendars",
+    "WEEK_BEFORE_SHORT": "calendars",
+    "ScheduleCache": "calendars",
+    "ScheduleStore": "calendars",
+    "Sessions": "calendars",
+    "WeekIndex": "calendars",
+    "get_short_weeks_with_holidays": "calendars",
+    "schedule_cache": "calendars",
+    "CHUNK_ROWS": "engine",
+    "DEFAULT_SESSION": "engine",
+    "EPOCH_MINUTE_DTYPE": "engine",
+    "MEMMAP_LAYOUTS": "engine",
+    "TIMESTAMP_FORMAT": "engine",
+    "WEEK_TYPES": "engine",
+    "ResultCache": "engine",
+    "SessionGrid": "engine",
+    "SessionSpec": "engine",
+    "TimestampEstimate": "engine",
+    "as_datetime64": "engine",
+    "estimate_timestamps": "engine",
+    "filter_key": "engine",
+    "filter_sessions": "engine",
+    "format_timestamp_bytes": "engine",
+    "format_timestamps": "engine",
+    "generate_calendar_timestamps": "engine",
+    "generate_epoch_minutes": "engine",
+    "generate_timestamp_memmap": "engine",
+    "generate_timestamp_array": "engine",
+    "generate_timestamps": "engine",
+    "generate_trading_dates": "engine",
+    "intraday_offsets": "engine",
+    "iter_timestamp_chunks": "engine",
+    "iter_timestamps": "engine",
+    "result_cache": "engine",
+    "CALENDAR_COLUMN": "export",
+    "DATE_COLUMN": "export",
+    "EXPORT_FORMATS": "export",
+    "TIMESTAMP_COLUMN": "export",
+    "ExportFormat": "export",
+    "format_size": "export",
+    "timestamps_table": "export",
+    "write_timestamps_arrow": "export",
+    "write_timestamps_csv": "export",
+    "write_timestamps_feather": "export",
+    "write_timestamps_parquet": "export",
+    "PROFILE_ENV": "profiling",
+    "Profile": "profiling",
+    "parse_profile_modes": "profiling",
+    "profile": "profiling",
+    "span": "profiling",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,437 @@
+"""Market calendars: cached trading schedules, week index and short-week lookup
+
+pandas and pandas_market_calendars are imported on first use, so importing this module only
+costs numpy. Schedules are also cached on disk (see ScheduleStore), in which case later
+processes don't import them at all.
+"""
+
+import glob
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+
+from .profiling import span
+
+# Week type flags; a week can both be short and precede another short week
+SHORT_WEEK = 1
+WEEK_BEFORE_SHORT = 2
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class Sessions(namedtuple("Sessions", ["days", "opens", "closes", "break_starts", "break_ends"])):
+    """Trading sessions of consecutive trading days, as parallel numpy arrays
+
+    ``days`` is datetime64[D]; the open, close and break times are naive datetime64[m] in the
+    calendar's local time. Days without a break have NaT break times.
+    """
+
+    __slots__ = ()
+
+    def take(self, index):
+        """Sessions selected by a slice, a boolean mask or an array of positions"""
+        return Sessions(*(column[index] for column in self))
+
+
+def _weekday(days):
+    """Weekday (0=Monday) of a datetime64[D] array"""
+    # 1970-01-01, day 0 of the epoch, was a Thursday
+    return (days.astype("int64") + 3) % 7
+
+
+def _week_start(days):
+    """Monday of the week of each date of a datetime64[D] array"""
+    return days - _weekday(days).astype("timedelta64[D]")
+
+
+def _isin_sorted(sorted_values, values):
+    """Membership of values in a sorted array, by binary search"""
+    positions = np.searchsorted(sorted_values, values)
+    found = positions < len(sorted_values)
+    found[found] = sorted_values[positions[found]] == values[found]
+    return found
+
+
+class WeekIndex:
+    """Sorted index of a calendar's trading weeks, keyed by the Monday of each week
+
+    Built once from a schedule covering whole weeks and the calendar's holiday list. Each week
+    with at least one trading day maps to its Monday to Friday trading-day count and its slice
+    of the sorted holiday array; a week with fewer than 5 trading days is a short week.
+    """
+
+    def __init__(self, trading_days, holidays):
+        # Only Monday to Friday sessions count towards a week
+        trading_days = trading_days[_weekday(trading_days) < 5]
+
+        # The schedule is sorted, so each week is one contiguous run of trading days and the
+        # days per week are counted in a single pass
+        week_keys = _week_start(trading_days)
+        run_starts = np.flatnonzero(np.r_[True, week_keys[1:] != week_keys[:-1]])
+
+        self.trading_days = trading_days
+        self.holidays = holidays
+        self.week_starts = week_keys[run_starts]
+        self.run_starts = run_starts
+        self.run_ends = np.r_[run_starts[1:], len(week_keys)]
+        self.day_counts = self.run_ends - self.run_starts
+
+        # Holidays between each Monday and Friday, as slices of the sorted holiday array
+        self.holiday_lo = np.searchsorted(holidays, self.week_starts, side="left")
+        self.holiday_hi = np.searchsorted(holidays, self.week_starts + np.timedelta64(4, "D"), side="right")
+
+        self.short_weeks = np.flatnonzero(self.day_counts < 5)
+        self.short_week_starts = self.week_starts[self.short_weeks]
+
+    def week_types(self, days):
+        """SHORT_WEEK / WEEK_BEFORE_SHORT flags for each date of a datetime64[D] array"""
+        week_keys = _week_start(days)
+        flags = np.zeros(len(days), dtype=np.int8)
+        flags[_isin_sorted(self.short_week_starts, week_keys)] |= SHORT_WEEK
+        flags[_isin_sorted(self.short_week_starts, week_keys + np.timedelta64(7, "D"))] |= WEEK_BEFORE_SHORT
+        return flags
+
+    def short_weeks_between(self, start, end):
+        """Positions of the short weeks whose Monday to Friday overlaps [start, end]"""
+        lo = np.searchsorted(self.week_starts, _week_start(start), side="left")
+        hi = np.searchsorted(self.week_starts, end, side="right")
+        return self.short_weeks[(self.short_weeks >= lo) & (self.short_weeks < hi)]
+
+
+# Units of the Sessions columns, which ScheduleStore saves as int64
+_SESSION_DTYPES = ("datetime64[D]", "datetime64[m]", "datetime64[m]", "datetime64[m]", "datetime64[m]")
+
+
+class ScheduleStore:
+    """On-disk cache of calendar sessions and holidays, shared by every process of a machine
+
+    Each calendar's sessions are one .npy file of int64 columns, named after the calendar and
+    the range it covers, and are loaded memory-mapped so that processes share the pages
+    instead of each building the schedule with pandas_market_calendars. Files live in a
+    directory named after the installed pandas_market_calendars version, so upgrading the
+    library invalidates them (older directories are removed). Files are written to a temporary
+    name and renamed into place, and failing to write only disables the write.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._directory = None
+
+    @classmethod
+    def default(cls):
+        """Store under $TIMESTAMPS_SMITH_CACHE_DIR, else the user cache directory; None if disabled"""
+        root = os.environ.get("TIMESTAMPS_SMITH_CACHE_DIR")
+        if root is None:
+            root = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "timestamps-smith"
+        return cls(root) if root else None
+
+    @property
+    def directory(self):
+        """Directory of the files of the installed pandas_market_calendars version"""
+        if self._directory is None:
+            from importlib.metadata import version
+
+            directory = self.root / f"pandas_market_calendars-{version('pandas_market_calendars')}"
+            if not directory.is_dir():
+                for stale in self.root.glob("pandas_market_calendars-*"):
+                    shutil.rmtree(stale, ignore_errors=True)
+            self._directory = directory
+        return self._directory
+
+    def has(self, market_calendar):
+        return any(self._session_files(market_calendar))
+
+    def load_sessions(self, market_calendar, start, end):
+        """(start, end, sessions) of the widest stored range covering start..end, or None"""
+        covering = [
+            (file_start, file_end, path)
+            for file_start, file_end, path in self._session_files(market_calendar)
+            if file_start <= start and end <= file_end
+        ]
+        if not covering:
+            return None
+
+        file_start, file_end, path = max(covering, key=lambda item: item[1] - item[0])
+        try:
+            columns = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return file_start, file_end, Sessions(*(
+            np.asarray(column).view(dtype) for column, dtype in zip(columns, _SESSION_DTYPES)
+        ))
+
+    def save_sessions(self, market_calendar, start, end, sessions):
+        """Store sessions covering start..end, replacing the stored ranges that they cover"""
+        superseded = [
+            path
+            for file_start, file_end, path in self._session_files(market_calendar)
+            if start <= file_start and file_end <= end
+        ]
+        columns = np.stack([
+            column.astype(dtype).view(np.int64) for column, dtype in zip(sessions, _SESSION_DTYPES)
+        ])
+        if self._save(f"{_file_name(market_calendar)}.{start}.{end}.npy", columns):
+            for path in superseded:
+                path.unlink(missing_ok=True)
+
+    def load_holidays(self, market_calendar):
+        path = self.directory / f"{_file_name(market_calendar)}.holidays.npy"
+        try:
+            return np.asarray(np.load(path, mmap_mode="r"))
+        except (OSError, ValueError):
+            return None
+
+    def save_holidays(self, market_calendar, holidays):
+        self._save(f"{_file_name(market_calendar)}.holidays.npy", holidays)
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self._directory = None
+
+    def _session_files(self, market_calendar):
+        """(start, end, path) of each stored sessions file of a calendar"""
+        prefix = _file_name(market_calendar)
+        for path in self.directory.glob(f"{glob.escape(prefix)}.*.*.npy"):
+            parts = path.name[len(prefix) + 1:-len(".npy")].split(".")
+            if len(parts) == 2:
+                try:
+                    yield np.datetime64(parts[0], "D"), np.datetime64(parts[1], "D"), path
+                except ValueError:
+                    continue
+
+    def _save(self, name, array):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as tmp:
+                np.save(tmp, array)
+            os.chmod(tmp.name, 0o644)
+            os.replace(tmp.name, self.directory / name)
+        except OSError:
+            return False
+        return True
+
+
+def _file_name(market_calendar):
+    """File name prefix of a calendar, which may contain characters like "/" ("24/7")"""
+    return quote(market_calendar, safe="")
+
+
+@dataclass
+class _CachedSchedule:
+    name: str
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    calendar: object = None
+    start: np.datetime64 = None
+    end: np.datetime64 = None
+    sessions: Sessions = None
+    holidays: np.ndarray = None
+    week_index: WeekIndex = None
+
+
+class ScheduleCache:
+    """Process-wide LRU cache of market calendars and their trading schedules
+
+    Holds the sessions of each calendar name, covering the widest date range requested so far
+    (rounded out to whole weeks); narrower requests are sliced out of them. At most ``maxsize``
+    calendars are kept (``None`` for no bound), evicting the least recently used one first.
+    Each calendar is loaded under its own lock, so threads can load different calendars at once.
+
+    With a ``store``, sessions and holidays are first looked up on disk and saved there once
+    built, and neither pandas nor pandas_market_calendars is imported when the store has them.
+    """
+
+    def __init__(self, maxsize=8, store=None):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def sessions(self, market_calendar, start_date, end_date):
+        """Local open, close and break times of a calendar's sessions between two dates (inclusive)"""
+        start = np.datetime64(start_date, "D")
+        end = np.datetime64(end_date, "D")
+
+        entry = self._entry(market_calendar)
+        with entry.lock:
+            self._cover(entry, start, end)
+            days = entry.sessions.days
+            return entry.sessions.take(
+                slice(np.searchsorted(days, start, side="left"), np.searchsorted(days, end, side="right"))
+            )
+
+    def holidays(self, market_calendar="NYSE"):
+        """Sorted datetime64[D] array of every holiday of a calendar"""
+        return self._holidays(self._entry(market_calendar))
+
+    def week_index(self, market_calendar, start_date, end_date):
+        """Week index of a calendar covering the weeks of start_date to end_date, plus the next one"""
+        # The week after end_date's is needed to tell whether that week precedes a short week
+        end = np.datetime64(end_date, "D") + np.timedelta64(7, "D")
+
+        entry = self._entry(market_calendar)
+        with entry.lock:
+            self._cover(entry, start_date, end)
+            if entry.week_index is None:
+                holidays = self._holidays(entry)
+                with span("calendar.week_index"):
+                    entry.week_index = WeekIndex(entry.sessions.days, holidays)
+            return entry.week_index
+
+    def _calendar(self, entry):
+        if entry.calendar is None:
+            with span("calendar.load"):
+                import pandas_market_calendars as mcal
+
+                entry.calendar = mcal.get_calendar(entry.name)
+        return entry.calendar
+
+    def _holidays(self, entry):
+        with entry.lock:
+            if entry.holidays is None and self.store is not None:
+                entry.holidays = self.store.load_holidays(entry.name)
+            if entry.holidays is None:
+                calendar = self._calendar(entry)
+                with span("calendar.holidays"):
+                    holidays = np.asarray(calendar.holidays().holidays, dtype="datetime64[D]")
+                    entry.holidays = np.sort(holidays, kind="stable")
+                if self.store is not None:
+                    self.store.save_holidays(entry.name, entry.holidays)
+            return entry.holidays
+
+    def _cover(self, entry, start_date, end_date):
+        """Grow a cache entry's sessions to cover the given dates; the caller holds the entry's lock"""
+        start = np.datetime64(start_date, "D")
+        end = np.datetime64(end_date, "D")
+
+        with self._lock:
+            if entry.sessions is not None and entry.start <= start and end <= entry.end:
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Grow the cached sessions to cover both the previous and the new range,
+        # from a Monday to a Sunday so that every cached week is complete
+        if entry.sessions is not None:
+            start, end = min(start, entry.start), max(end, entry.end)
+        start = _week_start(start)
+        end = _week_start(end) + np.timedelta64(6, "D")
+
+        stored = None
+        if self.store is not None:
+            with span("calendar.store_load"):
+                stored = self.store.load_sessions(entry.name, start, end)
+        if stored is not None:
+            entry.start, entry.end, entry.sessions = stored
+        else:
+            import pandas as pd
+
+            calendar = self._calendar(entry)
+            with span("calendar.schedule"):
+                schedule = calendar.schedule(start_date=pd.Timestamp(start), end_date=pd.Timestamp(end))
+                entry.sessions = _local_sessions(schedule, calendar.tz)
+            entry.start, entry.end = start, end
+            if self.store is not None:
+                self.store.save_sessions(entry.name, start, end, entry.sessions)
+
+        entry.week_index = None
+        return entry
+
+    def cache_info(self):
+        """Hit/miss counters and current size, like ``functools.lru_cache``"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self._maxsize, len(self._entries))
+
+    def cache_clear(self):
+        """Empty the in-memory cache; the store, if any, is kept"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def _entry(self, market_calendar):
+        with self._lock:
+            entry = self._entries.get(market_calendar)
+            if entry is None:
+                # A calendar found in the store is known to be valid, without importing the library
+                if self.store is None or not self.store.has(market_calendar):
+                    with span("calendar.import"):
+                        import pandas_market_calendars as mcal
+
+                        names = mcal.get_calendar_names()
+                    if market_calendar not in names:
+                        raise ValueError(f"unknown market calendar {market_calendar!r}")
+                entry = self._entries[market_calendar] = _CachedSchedule(market_calendar)
+                self._evict()
+            else:
+                self._entries.move_to_end(market_calendar)
+            return entry
+
+    def _evict(self):
+        while self._maxsize is not None and len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+
+def _local_sessions(schedule, tz):
+    """Sessions of a pandas_market_calendars schedule, converted from UTC to the calendar's time"""
+    def local(column):
+        if column not in schedule:
+            return np.full(len(schedule), np.datetime64("NaT", "m"))
+        return schedule[column].dt.tz_convert(tz).dt.tz_localize(None).to_numpy("datetime64[m]")
+
+    return Sessions(
+        schedule.index.values.astype("datetime64[D]"),
+        local("market_open"),
+        local("market_close"),
+        local("break_start"),
+        local("break_end"),
+    )
+
+
+schedule_cache = ScheduleCache(store=ScheduleStore.default())
+
+
+def get_short_weeks_with_holidays(start_date, end_date, market_calendar="NYSE"):
+    """Identify weeks with holidays (short trading weeks)"""
+    import pandas as pd
+
+    start = np.datetime64(pd.to_datetime(start_date).date(), "D")
+    end = np.datetime64(pd.to_datetime(end_date).date(), "D")
+
+    index = schedule_cache.week_index(market_calendar, start, end)
+
+    short_weeks = []
+    for week in index.short_weeks_between(start, end):
+        week_start = index.week_starts[week]
+
+        # Only include trading dates that fall within our original date range
+        week_days = index.trading_days[index.run_starts[week]:index.run_ends[week]]
+        filtered_trading_dates = week_days[(week_days >= start) & (week_days <= end)]
+
+        if len(filtered_trading_dates):  # Only add if there are trading dates in our range
+            short_weeks.append({
+                'week_start': week_start.astype(object),
+                'week_end': (week_start + np.timedelta64(4, "D")).astype(object),
+                'trading_days': int(index.day_counts[week]),  # Full week count
+                'trading_dates': filtered_trading_dates.astype(object).tolist(),  # Only dates in range
+                'holidays': list(index.holidays[index.holiday_lo[week]:index.holiday_hi[week]])
+            })
+
+    return short_weeks
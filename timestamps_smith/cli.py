@@ -0,0 +1,343 @@
+"""Command line entry point: ``timestamps-smith``
+
+Generates the same timestamps and short-week reports as the Streamlit app, without a browser
+session. Output is streamed to stdout or a file, and the generation modules are only imported
+once the arguments are parsed so that ``--help`` and argument errors return immediately.
+"""
+
+import argparse
+import csv
+import os
+import sys
+from datetime import date
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+WEEK_TYPE_NAMES = {
+    "short": "Short weeks",
+    "before-short": "Week before short week",
+    "regular": "Regular weeks",
+}
+FORMATS = ["csv", "parquet", "arrow", "feather", "epoch-minutes"]
+
+# Default --max-rows: 30 years of 1-minute timestamps of a nearly round-the-clock calendar
+MAX_ROWS = 20_000_000
+
+
+def _choices(names, base=0):
+    """Parse a comma separated list of names (or their 1-based/0-based numbers) into numbers"""
+    def parse(value):
+        numbers = []
+        for item in value.split(","):
+            item = item.strip().lower()
+            if item.isdigit() and base <= int(item) < len(names) + base:
+                numbers.append(int(item))
+            elif item[:3] in names:
+                numbers.append(names.index(item[:3]) + base)
+            else:
+                raise argparse.ArgumentTypeError(f"invalid choice: {item!r} (choose from {', '.join(names)})")
+        return numbers
+    return parse
+
+
+def _week_types(value):
+    week_types = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if item not in WEEK_TYPE_NAMES:
+            raise argparse.ArgumentTypeError(
+                f"invalid week type: {item!r} (choose from {', '.join(WEEK_TYPE_NAMES)})"
+            )
+        week_types.append(WEEK_TYPE_NAMES[item])
+    return week_types
+
+
+def _clock_range(value):
+    """Parse an "HH:MM-HH:MM" clock range"""
+    start, sep, end = value.partition("-")
+    if not sep or not all(part.strip().replace(":", "").isdigit() for part in (start, end)):
+        raise argparse.ArgumentTypeError(f"invalid time range: {value!r} (expected HH:MM-HH:MM)")
+    return start.strip(), end.strip()
+
+
+def _open_output(path, mode="wb"):
+    if path == "-":
+        return sys.stdout.buffer if "b" in mode else sys.stdout
+    return open(path, mode, newline="" if "b" not in mode else None)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="timestamps-smith",
+        description="Generate trading-day timestamps for Option Omega backtesting.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dates = argparse.ArgumentParser(add_help=False)
+    dates.add_argument("start_date", type=date.fromisoformat, help="first date, YYYY-MM-DD")
+    dates.add_argument("end_date", type=date.fromisoformat, help="last date (inclusive), YYYY-MM-DD")
+    dates.add_argument("--calendar", default="NYSE", help="pandas_market_calendars name (default: NYSE)")
+    dates.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument(
+        "--months", type=_choices(MONTHS, base=1), help="months to include, e.g. 1,2,12 or jan,feb,dec"
+    )
+    filters.add_argument(
+        "--weekdays",
+        type=_choices(WEEKDAYS),
+        help="weekdays to include, e.g. mon,wed or 0,2 (0=Monday, 6=Sunday)",
+    )
+    filters.add_argument(
+        "--week-types",
+        type=_week_types,
+        help=(
+            f"week types to include: {', '.join(WEEK_TYPE_NAMES)}; types come from the full calendar, "
+            "so the last week of the range is before-short if the week after it is short"
+        ),
+    )
+
+    timestamps = commands.add_parser(
+        "timestamps",
+        parents=[dates, filters],
+        help="generate intraday timestamps for the filtered trading days",
+    )
+    timestamps.add_argument("--interval", type=int, default=5, help="minutes between timestamps (default: 5)")
+    timestamps.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="csv",
+        help="output format (default: csv); epoch-minutes writes a raw int64 column to an -o file",
+    )
+    timestamps.add_argument(
+        "--entry-delay",
+        type=int,
+        default=2,
+        metavar="MINUTES",
+        help="minutes after each open of the first timestamp (default: 2)",
+    )
+    timestamps.add_argument(
+        "--close-margin",
+        type=int,
+        default=1,
+        metavar="MINUTES",
+        help="minimum minutes before each close of the last timestamp (default: 1)",
+    )
+    timestamps.add_argument(
+        "--window",
+        type=_clock_range,
+        action="append",
+        default=[],
+        metavar="HH:MM-HH:MM",
+        help="only keep times in this range, both ends included (repeatable)",
+    )
+    timestamps.add_argument(
+        "--exclude",
+        type=_clock_range,
+        action="append",
+        default=[],
+        metavar="HH:MM-HH:MM",
+        help="drop times from the start up to the end, e.g. a lunch break (repeatable)",
+    )
+    timestamps.add_argument(
+        "--max-rows",
+        type=int,
+        default=MAX_ROWS,
+        metavar="ROWS",
+        help=f"refuse requests of more timestamps than this, 0 for no limit (default: {MAX_ROWS:,})",
+    )
+    timestamps.add_argument(
+        "--estimate",
+        action="store_true",
+        help="print the number of timestamps and the output size instead of generating them",
+    )
+
+    commands.add_parser(
+        "dates", parents=[dates, filters], help="list the filtered trading dates, one per line"
+    )
+
+    commands.add_parser(
+        "short-weeks", parents=[dates], help="list the short weeks (weeks with holidays) as CSV"
+    )
+    return parser
+
+
+def write_timestamps(args):
+    from .calendars import schedule_cache
+    from .engine import (
+        CHUNK_ROWS,
+        MEMMAP_LAYOUTS,
+        SessionSpec,
+        estimate_timestamps,
+        generate_timestamp_memmap,
+        iter_timestamp_chunks,
+    )
+    from .export import EXPORT_FORMATS, format_size
+
+    # Fail on an unknown calendar or invalid session rules before anything is written; loading
+    # the sessions validates the calendar without importing the calendar library when the
+    # sessions are cached on disk
+    schedule_cache.sessions(args.calendar, args.start_date, args.end_date)
+    session_spec = SessionSpec(args.entry_delay, args.close_margin, args.window, args.exclude)
+
+    # Count the rows from the filtered sessions before generating anything
+    estimate = estimate_timestamps(
+        args.start_date,
+        args.end_date,
+        args.interval,
+        args.months,
+        args.weekdays,
+        args.week_types,
+        args.calendar,
+        session_spec=session_spec,
+    )
+    if args.format == "epoch-minutes":
+        size, exact = estimate.rows * MEMMAP_LAYOUTS["epoch_minutes"].itemsize, True
+    else:
+        export_format = EXPORT_FORMATS[args.format]
+        size, exact = export_format.size(estimate.rows, CHUNK_ROWS), export_format.exact_size
+
+    if args.estimate:
+        print(
+            f"{estimate.rows} timestamps on {estimate.days} trading days, "
+            f"{'' if exact else 'about '}{size} bytes as {args.format}"
+        )
+        return estimate.rows
+    if args.max_rows and estimate.rows > args.max_rows:
+        raise ValueError(
+            f"{estimate.rows:,} timestamps ({format_size(size)} as {args.format}) exceed the "
+            f"--max-rows limit of {args.max_rows:,}; raise it, or pass --max-rows 0 to disable it"
+        )
+
+    if args.format == "epoch-minutes":
+        # Memory-mapped file of the exact size, so it needs a real file rather than stdout
+        if args.output == "-":
+            raise ValueError("--format epoch-minutes needs an output file (-o)")
+        return len(generate_timestamp_memmap(
+            args.output,
+            args.start_date,
+            args.end_date,
+            args.interval,
+            args.months,
+            args.weekdays,
+            args.week_types,
+            args.calendar,
+            layout="epoch_minutes",
+            session_spec=session_spec,
+        ))
+
+    chunks = iter_timestamp_chunks(
+        args.start_date,
+        args.end_date,
+        args.interval,
+        args.months,
+        args.weekdays,
+        args.week_types,
+        args.calendar,
+        chunk_rows=CHUNK_ROWS,
+        session_spec=session_spec,
+    )
+    out = _open_output(args.output)
+    try:
+        return EXPORT_FORMATS[args.format].write(chunks, out)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+def write_trading_dates(args):
+    import numpy as np
+
+    from .engine import generate_trading_dates
+
+    trading_dates = generate_trading_dates(
+        args.start_date, args.end_date, args.months, args.weekdays, args.week_types, args.calendar
+    )
+
+    out = _open_output(args.output, "w")
+    try:
+        if len(trading_dates):
+            out.write("\n".join(np.datetime_as_string(trading_dates, unit="D")) + "\n")
+        return len(trading_dates)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def write_short_weeks(args):
+    from .calendars import get_short_weeks_with_holidays
+
+    short_weeks = get_short_weeks_with_holidays(args.start_date, args.end_date, args.calendar)
+
+    out = _open_output(args.output, "w")
+    try:
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(["week_start", "week_end", "trading_days", "trading_dates", "holidays"])
+        for week in short_weeks:
+            writer.writerow([
+                week["week_start"],
+                week["week_end"],
+                week["trading_days"],
+                " ".join(str(d) for d in week["trading_dates"]),
+                " ".join(str(h) for h in week["holidays"]),
+            ])
+        return len(short_weeks)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def run(args):
+    """Run a parsed command, profiling it when TIMESTAMPS_SMITH_PROFILE is set"""
+    from .profiling import env_profile_modes, profile
+
+    commands = {
+        "timestamps": write_timestamps,
+        "dates": write_trading_dates,
+        "short-weeks": write_short_weeks,
+    }
+    modes = env_profile_modes()
+    if modes is None:
+        return commands[args.command](args)
+
+    import logging
+
+    # The profile is logged to stderr as JSON lines, keeping stdout for the output
+    with profile(modes) as report:
+        result = commands[args.command](args)
+    log = logging.getLogger("timestamps_smith.profiling")
+    if not log.hasHandlers():
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+    report.log(log)
+    return result
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.start_date > args.end_date:
+        parser.error("start date must be before or equal to end date")
+    if args.command == "timestamps" and args.interval < 1:
+        parser.error("--interval must be a positive number of minutes")
+    if args.command == "timestamps" and min(args.entry_delay, args.close_margin) < 0:
+        parser.error("--entry-delay and --close-margin must be non-negative numbers of minutes")
+    if args.command == "timestamps" and args.max_rows < 0:
+        parser.error("--max-rows must be a positive number of rows, or 0 for no limit")
+
+    try:
+        run(args)
+    except (ValueError, ImportError) as exc:
+        parser.exit(2, f"{parser.prog}: error: {exc}\n")
+    except BrokenPipeError:
+        # Output piped into e.g. `head`: point stdout at devnull so the final flush doesn't fail
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,936 @@
+"""Timestamp generation: filtered trading sessions and their vectorized intraday grid"""
+
+import functools
+import os
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, time
+
+import numpy as np
+
+from .calendars import SHORT_WEEK, WEEK_BEFORE_SHORT, CacheInfo, Sessions, _weekday, schedule_cache
+from .profiling import span
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+
+# Regular NYSE session in minutes after midnight, the default for intraday_offsets
+SESSION_OPEN = 9 * 60 + 30
+SESSION_CLOSE = 16 * 60
+ENTRY_DELAY = 2  # the entry at the open is taken 2 minutes later (9:30 -> 9:32)
+CLOSE_MARGIN = 1  # the last timestamp is 1 minute before the close (3:59 PM)
+
+# Rows per chunk when streaming timestamps
+CHUNK_ROWS = 65_536
+
+# Compact timestamps: minutes since 1970-01-01, which fit in 32 bits until the year 6053
+EPOCH_MINUTE_DTYPE = np.int32
+
+# Row layouts of generate_timestamp_memmap files: newline-terminated TIMESTAMP_FORMAT text
+# records, or little-endian int64 minutes since 1970-01-01 (the bits of datetime64[m])
+MEMMAP_LAYOUTS = {
+    "records": np.dtype([("timestamp", "S16"), ("newline", "S1")]),
+    "epoch_minutes": np.dtype("<i8"),
+}
+
+# Week types are those of the full calendar, whatever the requested range: the last week of a
+# range is a "Week before short week" when the following week is short, even past end_date
+WEEK_TYPES = ("Short weeks", "Week before short week", "Regular weeks")
+
+
+def _selection(selected, every):
+    """Sorted tuple of the selected values, or None when nothing or everything is selected"""
+    if not selected:
+        return None
+    selected = tuple(sorted(set(selected)))
+    return None if set(every) <= set(selected) else selected
+
+
+def filter_key(
+    start_date: date,
+    end_date: date,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+):
+    """Normalized, hashable form of the date range, filters and calendar of a generation request
+
+    An empty selection and a selection of every value both mean "no filter" and become None;
+    other selections become sorted tuples, so equivalent requests map to the same key. The
+    date range comes last, as datetime64[D] values, so that ``ResultCache.get_range`` can match
+    requests differing only by their range.
+    """
+    return (
+        market_calendar,
+        _selection(selected_months, range(1, 13)),
+        _selection(selected_weekdays, range(7)),
+        _selection(selected_week_types, WEEK_TYPES),
+        np.datetime64(start_date, "D"),
+        np.datetime64(end_date, "D"),
+    )
+
+
+def _nbytes(value):
+    """Memory held by a cached value: its numpy arrays and bytes, recursively through tuples"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+
+def _freeze(value):
+    """Make the arrays of a cached value read-only, since every caller shares them"""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, tuple):
+        for item in value:
+            _freeze(item)
+
+
+class ResultCache:
+    """Process-wide LRU cache of generated results, bounded by their size in bytes
+
+    Keys are a result kind followed by a ``filter_key``, so the timestamps and the dates of the
+    same request share its filtered sessions. Values are numpy arrays, bytes or tuples of them,
+    and their arrays are returned read-only. The least recently used entries are evicted once
+    the cached values exceed ``maxbytes`` (``None`` for no bound); a single value larger than
+    that is returned without being cached.
+
+    Results that can be split by date are looked up with ``get_range``, which extends a cached
+    narrower range of the same request instead of recomputing it, e.g. when the end date moves
+    forward by a day.
+    """
+
+    def __init__(self, maxbytes=256 * 2**20):
+        self._maxbytes = maxbytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxbytes(self):
+        return self._maxbytes
+
+    @maxbytes.setter
+    def maxbytes(self, maxbytes):
+        with self._lock:
+            self._maxbytes = maxbytes
+            self._evict()
+
+    def get(self, key, compute):
+        """Cached value of a key, calling compute() to produce and cache it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        # Compute outside the lock so that requests for other keys aren't held up
+        return self._store(key, compute())
+
+    def get_range(self, key, compute, concatenate):
+        """Cached value of a key ending with a (start, end) date range, reusing cached sub-ranges
+
+        On a miss, the cached entry with the same leading key items and the widest date range
+        within the requested one is extended: compute(start, end) produces only the days before
+        and after it, and concatenate(parts) joins the parts in date order. Without such an
+        entry the whole range is computed.
+        """
+        prefix, (start, end) = key[:-2], key[-2:]
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+            base = None
+            for cached_key, (value, _) in self._entries.items():
+                if len(cached_key) != len(key) or cached_key[:-2] != prefix:
+                    continue
+                cached_start, cached_end = cached_key[-2:]
+                if start <= cached_start and cached_end <= end:
+                    if base is None or cached_end - cached_start > base[1] - base[0]:
+                        base = (cached_start, cached_end, value)
+
+        if base is None:
+            return self._store(key, compute(start, end))
+
+        cached_start, cached_end, value = base
+        one_day = np.timedelta64(1, "D")
+        parts = [value]
+        if start < cached_start:
+            parts.insert(0, compute(start, cached_start - one_day))
+        if cached_end < end:
+            parts.append(compute(cached_end + one_day, end))
+        return self._store(key, concatenate(parts))
+
+    def cache_info(self):
+        """Hit/miss counters, like ``functools.lru_cache``, with maxsize and currsize in bytes"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self._maxbytes, self.currbytes)
+
+    def cache_clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.currbytes = self.hits = self.misses = 0
+
+    def _store(self, key, value):
+        size = _nbytes(value)
+        _freeze(value)
+
+        with self._lock:
+            if self._maxbytes is None or size <= self._maxbytes:
+                self._discard(key)
+                self._entries[key] = (value, size)
+                self.currbytes += size
+                self._evict()
+        return value
+
+    def _discard(self, key):
+        if key in self._entries:
+            self.currbytes -= self._entries.pop(key)[1]
+
+    def _evict(self):
+        while self._maxbytes is not None and self.currbytes > self._maxbytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.currbytes -= size
+
+
+result_cache = ResultCache()
+
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _clock_minute(value):
+    """Minutes after midnight of an "HH:MM" string, a datetime.time or a number of minutes"""
+    if isinstance(value, str):
+        hours, _, minutes = value.partition(":")
+        minute = int(hours) * 60 + int(minutes or 0)
+    elif isinstance(value, time):
+        minute = value.hour * 60 + value.minute
+    else:
+        minute = int(value)
+
+    if not 0 <= minute <= MINUTES_PER_DAY:
+        raise ValueError(f"clock time out of range: {value!r}")
+    return minute
+
+
+def _clock_ranges(ranges):
+    return tuple((_clock_minute(start), _clock_minute(end)) for start, end in ranges)
+
+
+def _clock_span(minutes, start, end):
+    """Minutes of the day from start to end (exclusive), wrapping past midnight when end < start"""
+    if start <= end:
+        return (minutes >= start) & (minutes < end)
+    return (minutes >= start) | (minutes < end)
+
+
+@functools.lru_cache(maxsize=64)
+def _clock_mask(windows, exclusions):
+    """Read-only mask of the minutes of the day kept by a session spec's windows and exclusions"""
+    minutes = np.arange(MINUTES_PER_DAY)
+    keep = np.zeros(MINUTES_PER_DAY, dtype=bool) if windows else np.ones(MINUTES_PER_DAY, dtype=bool)
+    for start, end in windows:
+        keep |= _clock_span(minutes, start, end + 1)
+    for start, end in exclusions:
+        keep &= ~_clock_span(minutes, start, end)
+    keep.flags.writeable = False
+    return keep
+
+
+class SessionSpec(namedtuple("SessionSpec", ["entry_delay", "close_margin", "windows", "exclusions"])):
+    """Declarative intraday rules: where each session's grid starts and stops and which times it keeps
+
+    A session's grid starts ``entry_delay`` minutes after its open and steps by the interval up
+    to ``close_margin`` minutes before its close, so it follows early closes and each calendar's
+    hours. ``windows`` are (start, end) local clock times to keep, both ends included (all times
+    when empty), and ``exclusions`` are [start, end) clock times to drop, like the calendar's
+    own breaks; a range whose end is before its start wraps past midnight. Times are "HH:MM"
+    strings, datetime.time values or minutes after midnight.
+
+    The windows and exclusions are compiled once into a mask over the 1440 minutes of the day,
+    which the grid of every session shape is looked up in. For example, a 9:31 entry that
+    stops at 3:45 PM is ``SessionSpec(entry_delay=1, windows=[("9:30", "15:45")])``.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, entry_delay=ENTRY_DELAY, close_margin=CLOSE_MARGIN, windows=(), exclusions=()):
+        entry_delay, close_margin = int(entry_delay), int(close_margin)
+        if entry_delay < 0 or close_margin < 0:
+            raise ValueError(
+                f"entry_delay and close_margin must be non-negative numbers of minutes, "
+                f"got {entry_delay} and {close_margin}"
+            )
+        return super().__new__(
+            cls, entry_delay, close_margin, _clock_ranges(windows), _clock_ranges(exclusions)
+        )
+
+    def offsets(self, interval_min, open_minute, close_minute, break_start=0, break_end=0):
+        """Minute offsets from midnight of the grid of one session"""
+        if interval_min < 1:
+            raise ValueError(f"interval_min must be a positive number of minutes, got {interval_min}")
+
+        # The open is replaced by the entry and the grid keeps stepping from there, so the rest
+        # of the day is aligned to the entry (9:32) rather than to the open (9:30)
+        first, last = open_minute + self.entry_delay, close_minute - self.close_margin
+        offsets = np.arange(first, last + 1, interval_min)
+        keep = _clock_mask(self.windows, self.exclusions)[offsets % MINUTES_PER_DAY]
+        return offsets[keep & ((offsets < break_start) | (offsets >= break_end))]
+
+
+DEFAULT_SESSION = SessionSpec()
+
+
+def intraday_offsets(
+    interval_min: int, open_minute=SESSION_OPEN, close_minute=SESSION_CLOSE, session_spec=None
+):
+    """Minute-of-day offsets for one session: entry 2 minutes after the open, then every interval
+
+    The last offset is at most a minute before the close (3:59 PM for the regular NYSE session).
+    A SessionSpec replaces these default rules.
+    """
+    return (session_spec or DEFAULT_SESSION).offsets(interval_min, open_minute, close_minute)
+
+
+def _minutes_after_midnight(times, days):
+    """Minutes between each day's midnight and a datetime64[m] time, 0 where the time is NaT"""
+    minutes = (times - days.astype("datetime64[m]")).astype("int64")
+    return np.where(np.isnat(times), 0, minutes)
+
+
+class SessionGrid:
+    """Intraday timestamp grid of a run of trading sessions
+
+    Days are grouped by session shape (open, close and break times relative to midnight), so
+    the grid is computed once per distinct shape, typically a regular day and an early close,
+    and broadcast over all the days sharing it. The grid of a shape follows ``session_spec``
+    (DEFAULT_SESSION when None).
+    """
+
+    def __init__(self, sessions, interval_min, session_spec=None):
+        with span("grid.build"):
+            session_spec = session_spec or DEFAULT_SESSION
+            shapes = np.column_stack([
+                _minutes_after_midnight(column, sessions.days)
+                for column in (sessions.opens, sessions.closes, sessions.break_starts, sessions.break_ends)
+            ]).reshape(-1, 4)
+
+            # Pack each shape into one integer key (13 bits per time, which fits offsets of -4096 to
+            # 4095 minutes) so that finding the distinct shapes is a 1-D unique
+            keys = ((shapes + 4096) << np.array([39, 26, 13, 0])).sum(axis=1)
+            _, first_days, day_shapes = np.unique(keys, return_index=True, return_inverse=True)
+
+            # Minute offsets from midnight of each distinct shape
+            self.grids = []
+            for open_minute, close_minute, break_start, break_end in shapes[first_days]:
+                offsets = session_spec.offsets(
+                    interval_min, open_minute, close_minute, break_start, break_end
+                )
+                self.grids.append(offsets.astype("timedelta64[m]"))
+
+            shape_counts = np.array([len(grid) for grid in self.grids], dtype=np.int64)
+            self.days = sessions.days
+            self.day_shapes = day_shapes.ravel()
+            self.day_counts = shape_counts[self.day_shapes]
+            self.row_ends = np.cumsum(self.day_counts)
+
+    def __len__(self):
+        return int(self.row_ends[-1]) if len(self.row_ends) else 0
+
+    def expand(self, first_day=0, last_day=None):
+        """Timestamps of days[first_day:last_day] as a datetime64[m] array, ordered by day and time"""
+        with span("grid.expand"):
+            days = self.days[first_day:last_day].astype("datetime64[m]")
+            shapes = self.day_shapes[first_day:last_day]
+            row_ends = np.cumsum(self.day_counts[first_day:last_day])
+
+            stamps = np.empty(row_ends[-1] if len(row_ends) else 0, dtype="datetime64[m]")
+
+            # Each run of consecutive days sharing a shape is one (days x offsets) block of the
+            # output, filled in place by broadcasting the days over the shape's offsets
+            runs = np.flatnonzero(np.r_[True, shapes[1:] != shapes[:-1]]) if len(shapes) else []
+            for run_start, run_end in zip(runs, np.r_[runs[1:], len(shapes)]):
+                grid = self.grids[shapes[run_start]]
+                block = stamps[row_ends[run_start] - len(grid):row_ends[run_end - 1]]
+                np.add(days[run_start:run_end, None], grid, out=block.reshape(run_end - run_start, len(grid)))
+
+            return stamps
+
+    def epoch_minutes(self):
+        """Timestamps of all the days as int32 minutes since 1970-01-01, expanded a chunk at a time"""
+        minutes = np.empty(len(self), dtype=EPOCH_MINUTE_DTYPE)
+        row = 0
+        for chunk in self.chunks(CHUNK_ROWS):
+            minutes[row:row + len(chunk)] = chunk.view(np.int64)
+            row += len(chunk)
+        return minutes
+
+    def chunks(self, chunk_rows):
+        """Timestamps as consecutive datetime64[m] arrays of chunk_rows rows (the last may be shorter)"""
+        total_rows = len(self)
+        for first_row in range(0, total_rows, chunk_rows):
+            last_row = min(first_row + chunk_rows, total_rows)
+
+            # Expand only the days overlapping [first_row, last_row) and cut the rows out of them
+            first_day = np.searchsorted(self.row_ends, first_row, side="right")
+            last_day = np.searchsorted(self.row_ends, last_row - 1, side="right") + 1
+            skip = first_row - (self.row_ends[first_day] - self.day_counts[first_day])
+            yield self.expand(first_day, last_day)[skip:skip + last_row - first_row]
+
+
+def filter_sessions(
+    start_date: date,
+    end_date: date,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+):
+    """Sessions of the trading days in the date range that pass the month, weekday and week type filters"""
+    key = filter_key(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    )
+    # Week types are looked up in the calendar's week index, which doesn't depend on the requested
+    # range, so the sessions of a wider range are the cached ones plus those of the extra days
+    return result_cache.get_range(
+        ("sessions",) + key,
+        lambda start, end: _filter_sessions(*key[:-2], start, end),
+        _concatenate_sessions,
+    )
+
+
+def _concatenate_sessions(parts):
+    return Sessions(*(np.concatenate(columns) for columns in zip(*parts)))
+
+
+def _lookup_table(selected, size):
+    """Boolean table of size entries, True at the selected values"""
+    table = np.zeros(size, dtype=bool)
+    table[[value for value in selected if 0 <= value < size]] = True
+    return table
+
+
+def _week_type_table(selected_week_types):
+    """Boolean table of the selected week types, indexed by week type flags"""
+    flags = np.arange((SHORT_WEEK | WEEK_BEFORE_SHORT) + 1)
+    table = np.zeros(len(flags), dtype=bool)
+    if "Short weeks" in selected_week_types:
+        table |= (flags & SHORT_WEEK) != 0
+    if "Week before short week" in selected_week_types:
+        table |= (flags & WEEK_BEFORE_SHORT) != 0
+    if "Regular weeks" in selected_week_types:
+        table |= flags == 0
+    return table
+
+
+def _filter_sessions(
+    market_calendar, selected_months, selected_weekdays, selected_week_types, start_date, end_date
+):
+    """filter_sessions on the normalized arguments of a filter_key, None meaning no filter"""
+    with span("filter"):
+        # Get trading sessions in the date range. The week index covers the week after end_date
+        # too, so it is loaded first: the sessions are then sliced out of the same schedule
+        # instead of the schedule being built twice
+        if selected_week_types is not None:
+            index = schedule_cache.week_index(market_calendar, start_date, end_date)
+        sessions = schedule_cache.sessions(market_calendar, start_date, end_date)
+        trading_dates = sessions.days
+
+        # Each filter is a small lookup table of the values it keeps, indexed by every day's month,
+        # weekday or week type flags at once
+        keep = np.ones(len(trading_dates), dtype=bool)
+        if selected_months is not None:
+            months = trading_dates.astype("datetime64[M]").astype(np.int64) % 12
+            keep &= _lookup_table([month - 1 for month in selected_months], 12)[months]
+        if selected_weekdays is not None:
+            keep &= _lookup_table(selected_weekdays, 7)[_weekday(trading_dates)]
+        if selected_week_types is not None:
+            keep &= _week_type_table(selected_week_types)[index.week_types(trading_dates)]
+
+        return sessions.take(keep)
+
+
+def generate_trading_dates(
+    start_date: date,
+    end_date: date,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+):
+    """Trading dates in the date range that pass the month, weekday and week type filters
+
+    Returns a datetime64[D] array taken straight from the schedule, without generating any
+    intraday timestamps.
+    """
+    return filter_sessions(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    ).days
+
+
+def _generate_grid(
+    kind,
+    expand,
+    start_date,
+    end_date,
+    interval_min,
+    selected_months,
+    selected_weekdays,
+    selected_week_types,
+    market_calendar,
+    session_spec,
+):
+    """Memoized expand(grid) of the filtered sessions' grid, extended day ranges at a time"""
+    session_spec = session_spec or DEFAULT_SESSION
+    sessions = filter_sessions(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    )
+
+    def compute(start, end):
+        days = sessions.days
+        first_day, last_day = np.searchsorted(days, start), np.searchsorted(days, end, side="right")
+        return expand(SessionGrid(sessions.take(slice(first_day, last_day)), interval_min, session_spec))
+
+    key = filter_key(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    )
+    return result_cache.get_range((kind, interval_min, session_spec) + key, compute, np.concatenate)
+
+
+def generate_timestamp_array(
+    start_date: date,
+    end_date: date,
+    interval_min: int,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+    *,
+    session_spec=None,
+    shard_months=None,
+    max_workers=None,
+):
+    """Generate timestamps as a datetime64[m] array, one intraday grid per filtered trading session
+
+    Each session's grid follows ``session_spec`` (DEFAULT_SESSION when None). Results are
+    memoized in ``result_cache``; the returned array is read-only.
+
+    Setting ``shard_months`` expands the grids in a pool of ``max_workers`` processes, in shards
+    of that many months (12 for calendar years) concatenated in order. The sessions are filtered
+    here and the workers only expand them, but starting the workers and sending the timestamps
+    back usually costs more than the expansion itself (see the shard cases of
+    benchmarks/bench.py), so measure before using it. Workers are started with forkserver or
+    spawn, which import the caller's ``__main__`` module again: a script using shards must keep
+    its own work under ``if __name__ == "__main__":``, or the pool fails with BrokenProcessPool.
+    """
+    if shard_months is None:
+        return _generate_grid(
+            "timestamps",
+            SessionGrid.expand,
+            start_date,
+            end_date,
+            interval_min,
+            selected_months,
+            selected_weekdays,
+            selected_week_types,
+            market_calendar,
+            session_spec,
+        )
+
+    if shard_months < 1:
+        raise ValueError(f"shard_months must be a positive number of months, got {shard_months}")
+    key = filter_key(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    )
+    session_spec = session_spec or DEFAULT_SESSION
+    sessions = filter_sessions(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    )
+    return result_cache.get_range(
+        ("timestamps", interval_min, session_spec) + key,
+        lambda start, end: _generate_shards(
+            sessions, start, end, interval_min, session_spec, shard_months, max_workers
+        ),
+        np.concatenate,
+    )
+
+
+def _shard_ranges(start, end, shard_months):
+    """(start, end) datetime64[D] pairs splitting start..end at every shard_months-th month"""
+    first_month, last_month = start.astype("datetime64[M]"), end.astype("datetime64[M]")
+    months = np.arange(first_month + np.timedelta64(1, "M"), last_month + np.timedelta64(1, "M"))
+
+    # Counting months from January 1970 aligns 12-month shards to calendar years
+    cuts = months[months.astype(np.int64) % shard_months == 0].astype("datetime64[D]")
+    return list(zip(np.r_[start, cuts], np.r_[cuts - np.timedelta64(1, "D"), end]))
+
+
+def _expand_shard(sessions, interval_min, session_spec):
+    """Timestamps of one shard's sessions, run in a worker process"""
+    return SessionGrid(sessions, interval_min, session_spec).expand()
+
+
+def _generate_shards(sessions, start, end, interval_min, session_spec, shard_months, max_workers):
+    """Timestamps of the filtered sessions from start to end, expanded a shard at a time in a process pool"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # The sessions are already filtered, with the week types of the whole calendar, so workers
+    # neither import the calendar library nor build schedules: they only expand their slice
+    days = sessions.days
+    shards = [
+        sessions.take(slice(np.searchsorted(days, first), np.searchsorted(days, last, side="right")))
+        for first, last in _shard_ranges(start, end, shard_months)
+    ]
+    if len(shards) == 1:
+        return _expand_shard(shards[0], interval_min, session_spec)
+
+    # Workers aren't forked, since forking a multi-threaded caller (e.g. the app) can deadlock them
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context(method)) as pool:
+        return np.concatenate(list(pool.map(
+            _expand_shard, shards, [interval_min] * len(shards), [session_spec] * len(shards)
+        )))
+
+
+def generate_epoch_minutes(
+    start_date: date,
+    end_date: date,
+    interval_min: int,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+    *,
+    session_spec=None,
+):
+    """Generate timestamps as a compact int32 array of minutes since 1970-01-01
+
+    Holds the same timestamps as generate_timestamp_array in half the memory (4 bytes a row,
+    about 11 MB for 30 years of 1-minute timestamps). format_timestamps and the export writers
+    accept these arrays, or slices of them, and only format them as they are written. Results
+    are memoized in ``result_cache``; the returned array is read-only.
+    """
+    return _generate_grid(
+        "epoch_minutes",
+        SessionGrid.epoch_minutes,
+        start_date,
+        end_date,
+        interval_min,
+        selected_months,
+        selected_weekdays,
+        selected_week_types,
+        market_calendar,
+        session_spec,
+    )
+
+
+def generate_calendar_timestamps(
+    start_date: date,
+    end_date: date,
+    interval_min: int,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendars=("NYSE",),
+    max_workers=None,
+    *,
+    session_spec=None,
+):
+    """Generate the timestamps of several calendars at once, as a dict of datetime64[m] arrays
+
+    The filters are normalized once and shared; each calendar's schedule is then loaded and its
+    grid expanded in a pool of threads (one per CPU by default), since calendars don't depend on
+    each other and the NumPy work releases the GIL. Keys follow the order of market_calendars,
+    and each array is that of generate_timestamp_array. See ``export.timestamps_table`` for a
+    long-format table with a calendar column.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    market_calendars = list(dict.fromkeys(market_calendars))
+    _, months, weekdays, week_types, start, end = filter_key(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types
+    )
+    if not market_calendars:
+        return {}
+
+    with ThreadPoolExecutor(max_workers or min(len(market_calendars), os.cpu_count() or 1)) as pool:
+        futures = {
+            market_calendar: pool.submit(
+                generate_timestamp_array,
+                start,
+                end,
+                interval_min,
+                months,
+                weekdays,
+                week_types,
+                market_calendar,
+                session_spec=session_spec,
+            )
+            for market_calendar in market_calendars
+        }
+        return {market_calendar: future.result() for market_calendar, future in futures.items()}
+
+
+# Estimated size of a request; the memory is that of the timestamps held as a datetime64[m]
+# array, int32 epoch minutes or a list of TIMESTAMP_FORMAT strings
+TimestampEstimate = namedtuple(
+    "TimestampEstimate", ["days", "rows", "array_bytes", "epoch_minute_bytes", "string_bytes"]
+)
+
+# A list entry and its 16-character str
+_STRING_ROW_BYTES = 8 + sys.getsizeof("2024-01-02 09:32")
+
+
+def estimate_timestamps(
+    start_date: date,
+    end_date: date,
+    interval_min: int,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+    *,
+    session_spec=None,
+):
+    """Exact row count and memory of a request, counted from its filtered sessions
+
+    Rows are summed from the per-day grid sizes of each session shape, so the cost is that of
+    filtering the schedule, O(days), and no timestamp is expanded. Export sizes follow from the
+    row count, see ``ExportFormat.size``.
+    """
+    sessions = filter_sessions(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    )
+    rows = len(SessionGrid(sessions, interval_min, session_spec))
+    return TimestampEstimate(
+        len(sessions.days),
+        rows,
+        rows * np.dtype("datetime64[m]").itemsize,
+        rows * np.dtype(EPOCH_MINUTE_DTYPE).itemsize,
+        rows * _STRING_ROW_BYTES,
+    )
+
+
+def generate_timestamp_memmap(
+    path,
+    start_date: date,
+    end_date: date,
+    interval_min: int,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+    *,
+    layout="records",
+    session_spec=None,
+):
+    """Write timestamps straight into a memory-mapped file at path, returning a read-only view of it
+
+    The file holds one row per timestamp in a MEMMAP_LAYOUTS layout, with no header: "records"
+    is a text file of TIMESTAMP_FORMAT lines, whose ``["timestamp"]`` field views as S16
+    strings, and "epoch_minutes" an int64 column that ``.view("datetime64[m]")`` turns into
+    timestamps. The row count is known from the filtered sessions, so the file is allocated at
+    its exact size and filled a chunk at a time; only the mapped pages in use are held in
+    memory, whatever the length of the range. Other processes can map the file with
+    ``np.memmap(path, MEMMAP_LAYOUTS[layout], "r")``. An empty result writes an empty file
+    and returns an empty array, as empty files cannot be mapped.
+    """
+    if layout not in MEMMAP_LAYOUTS:
+        raise ValueError(f"unknown memmap layout {layout!r}, expected one of {', '.join(MEMMAP_LAYOUTS)}")
+    dtype = MEMMAP_LAYOUTS[layout]
+
+    sessions = filter_sessions(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    )
+    grid = SessionGrid(sessions, interval_min, session_spec)
+    rows = len(grid)
+    if rows == 0:
+        open(path, "wb").close()
+        return np.empty(0, dtype=dtype)
+
+    out = np.memmap(path, dtype=dtype, mode="w+", shape=(rows,))
+    row = 0
+    for chunk in grid.chunks(CHUNK_ROWS):
+        if layout == "records":
+            format_timestamp_bytes(chunk, out=out[row:row + len(chunk)])
+        else:
+            out[row:row + len(chunk)] = chunk.view(np.int64)
+        row += len(chunk)
+    out.flush()
+    del out
+
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+
+def as_datetime64(timestamps):
+    """Timestamps as datetime64, converting int32 epoch minutes to datetime64[m]"""
+    timestamps = np.asarray(timestamps)
+    if timestamps.dtype.kind in "iu":
+        return timestamps.astype("datetime64[m]")
+    return timestamps
+
+
+def _minute_table():
+    """"HH:MM" of every minute of the day, as a (1440, 5) ASCII byte table"""
+    hours, minutes = np.divmod(np.arange(24 * 60), 60)
+    zero = ord("0")
+    return np.column_stack([
+        zero + hours // 10,
+        zero + hours % 10,
+        np.full_like(hours, ord(":")),
+        zero + minutes // 10,
+        zero + minutes % 10,
+    ]).astype(np.uint8)
+
+
+_MINUTE_TABLE = _minute_table()
+
+
+def format_timestamp_bytes(timestamps, terminator=b"\n", out=None):
+    """Format timestamps as fixed-width ASCII TIMESTAMP_FORMAT records, each followed by terminator
+
+    Returns a flat uint8 buffer of len(timestamps) records of 16 bytes plus the terminator, which
+    can be written to a binary file as is, or fills ``out`` (e.g. a slice of a memory map) with
+    them. Every record is assembled from a table of the dates spanned by the timestamps and a
+    table of the 1440 "HH:MM" times, with no per-row strings.
+    """
+    minutes = as_datetime64(timestamps).astype("datetime64[m]").view(np.int64)
+    width = 16 + len(terminator)
+    if out is None:
+        records = np.empty((len(minutes), width), dtype=np.uint8)
+    elif out.nbytes != len(minutes) * width:
+        raise ValueError(f"out holds {out.nbytes} bytes, {len(minutes) * width} are needed")
+    else:
+        records = out.view(np.uint8).reshape(len(minutes), width)
+    if len(minutes) == 0:
+        return records.reshape(-1)
+
+    with span("format"):
+        days, minute_of_day = np.divmod(minutes, 24 * 60)
+        first_day = days.min()
+        dates = np.arange(first_day, days.max() + 1).astype("datetime64[D]")
+        date_table = np.datetime_as_string(dates).astype("S10").view(np.uint8).reshape(-1, 10)
+
+        records[:, :10] = date_table[days - first_day]
+        records[:, 10] = ord(" ")
+        records[:, 11:16] = _MINUTE_TABLE[minute_of_day]
+        records[:, 16:] = np.frombuffer(terminator, dtype=np.uint8)
+    return records.reshape(-1)
+
+
+def format_timestamps(timestamps):
+    """Format a datetime64[m] array, or int32 epoch minutes, as TIMESTAMP_FORMAT strings"""
+    if len(timestamps) == 0:
+        return []
+
+    with span("format.strings"):
+        return format_timestamp_bytes(timestamps, terminator=b"").view("S16").astype("U16").tolist()
+
+
+def iter_timestamp_chunks(
+    start_date: date,
+    end_date: date,
+    interval_min: int,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+    chunk_rows=None,
+    *,
+    session_spec=None,
+):
+    """Yield timestamps as datetime64[m] arrays, one per trading day or of chunk_rows rows each
+
+    Only the filtered trading days are materialized up front; each chunk is built when it is
+    requested, so consumers can stream any range in bounded memory.
+    """
+    if chunk_rows is not None and chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be a positive number of rows, got {chunk_rows}")
+
+    sessions = filter_sessions(
+        start_date, end_date, selected_months, selected_weekdays, selected_week_types, market_calendar
+    )
+    grid = SessionGrid(sessions, interval_min, session_spec)
+
+    if chunk_rows is None:
+        for day, count in enumerate(grid.day_counts):
+            if count:
+                yield grid.expand(day, day + 1)
+    else:
+        yield from grid.chunks(chunk_rows)
+
+
+def iter_timestamps(
+    start_date: date,
+    end_date: date,
+    interval_min: int,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+    *,
+    session_spec=None,
+):
+    """Yield timestamps one by one as TIMESTAMP_FORMAT strings, formatted a chunk at a time"""
+    for chunk in iter_timestamp_chunks(
+        start_date,
+        end_date,
+        interval_min,
+        selected_months,
+        selected_weekdays,
+        selected_week_types,
+        market_calendar,
+        chunk_rows=CHUNK_ROWS,
+        session_spec=session_spec,
+    ):
+        yield from format_timestamps(chunk)
+
+
+def generate_timestamps(
+    start_date: date,
+    end_date: date,
+    interval_min: int,
+    selected_months=None,
+    selected_weekdays=None,
+    selected_week_types=None,
+    market_calendar="NYSE",
+    *,
+    session_spec=None,
+    shard_months=None,
+    max_workers=None,
+):
+    """Generate timestamps with 9:32 AM entry and intervals up to 3:59 PM for market trading days
+
+    Times follow each day's actual session: the entry is 2 minutes after the open and the last
+    timestamp at most a minute before the close, so early closes and other calendars' trading
+    hours are honored. A SessionSpec replaces these rules, and generate_timestamp_array
+    describes the parallel ``shard_months`` mode.
+    """
+    with span("generate_timestamps"):
+        return format_timestamps(
+            generate_timestamp_array(
+                start_date,
+                end_date,
+                interval_min,
+                selected_months,
+                selected_weekdays,
+                selected_week_types,
+                market_calendar,
+                session_spec=session_spec,
+                shard_months=shard_months,
+                max_workers=max_workers,
+            )
+        )
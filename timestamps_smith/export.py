@@ -0,0 +1,233 @@
+"""Streaming writers for generated timestamps: CSV and the Arrow-based columnar formats"""
+
+import functools
+import io
+from collections import namedtuple
+
+from .engine import CHUNK_ROWS, as_datetime64, format_timestamp_bytes
+from .profiling import span
+
+# Exported column names; the date column is only written by the columnar formats
+TIMESTAMP_COLUMN = "OPEN_DATETIME"
+DATE_COLUMN = "DATE"
+CALENDAR_COLUMN = "CALENDAR"
+
+# ``size(rows, chunk_rows)`` is the file size of rows timestamps written in chunks of chunk_rows,
+# exact when ``exact_size`` is set and an approximation otherwise
+ExportFormat = namedtuple("ExportFormat", ["label", "extension", "mime", "write", "size", "exact_size"])
+
+
+def write_timestamps_csv(chunks, out):
+    """Write timestamp chunks as a one-column CSV to a binary file object, returning the row count
+
+    Chunks are datetime64 or int32 epoch-minute arrays; only one formatted chunk is held in
+    memory at a time.
+    """
+    out.write(f"{TIMESTAMP_COLUMN}\n".encode("ascii"))
+
+    rows = 0
+    for chunk in chunks:
+        if len(chunk):
+            with span("export.write"):
+                out.write(format_timestamp_bytes(chunk))
+            rows += len(chunk)
+    return rows
+
+
+def timestamps_table(calendar_timestamps):
+    """Long-format DataFrame of per-calendar timestamps, with a categorical calendar column
+
+    Takes a dict of calendar name to timestamps, as returned by generate_calendar_timestamps,
+    and stacks the calendars in the dict's order.
+    """
+    import numpy as np
+    import pandas as pd
+
+    names = list(calendar_timestamps)
+    timestamps = [as_datetime64(calendar_timestamps[name]) for name in names]
+    codes = np.repeat(np.arange(len(names)), [len(chunk) for chunk in timestamps])
+    return pd.DataFrame({
+        CALENDAR_COLUMN: pd.Categorical.from_codes(codes, categories=names),
+        TIMESTAMP_COLUMN: np.concatenate(timestamps) if timestamps else np.array([], dtype="datetime64[m]"),
+    })
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise ImportError(
+            "Parquet and Arrow exports require pyarrow, install it with: pip install 'oo-timestamps[arrow]'"
+        ) from exc
+    return pa
+
+
+def _arrow_schema(pa, date_column):
+    fields = [(TIMESTAMP_COLUMN, pa.timestamp("s"))]
+    if date_column:
+        fields.append((DATE_COLUMN, pa.date32()))
+    return pa.schema(fields)
+
+
+def _arrow_batches(pa, schema, chunks):
+    """Typed record batches for timestamp chunks: datetime64 timestamps and, optionally, their date"""
+    for chunk in chunks:
+        if len(chunk):
+            with span("export.batch"):
+                chunk = as_datetime64(chunk)
+                columns = [pa.array(chunk.astype("datetime64[s]"), type=pa.timestamp("s"))]
+                if DATE_COLUMN in schema.names:
+                    columns.append(pa.array(chunk.astype("datetime64[D]"), type=pa.date32()))
+                batch = pa.RecordBatch.from_arrays(columns, schema=schema)
+            yield batch
+
+
+def write_timestamps_parquet(chunks, out, date_column=True):
+    """Write timestamp chunks as a Parquet file (one row group per chunk), returning the row count
+
+    The timestamps are stored as a typed timestamp column, with an extra date column to
+    partition on when ``date_column`` is set.
+    """
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, date_column)
+    rows = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for batch in _arrow_batches(pa, schema, chunks):
+            with span("export.write"):
+                writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def write_timestamps_arrow(chunks, out, date_column=True):
+    """Write timestamp chunks as an Arrow IPC stream, returning the row count"""
+    pa = _import_pyarrow()
+
+    schema = _arrow_schema(pa, date_column)
+    rows = 0
+    with pa.ipc.new_stream(out, schema) as writer:
+        for batch in _arrow_batches(pa, schema, chunks):
+            with span("export.write"):
+                writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def write_timestamps_feather(chunks, out, date_column=True):
+    """Write timestamp chunks as a Feather (Arrow IPC file) file, returning the row count"""
+    pa = _import_pyarrow()
+
+    schema = _arrow_schema(pa, date_column)
+    rows = 0
+    with pa.ipc.new_file(out, schema) as writer:
+        for batch in _arrow_batches(pa, schema, chunks):
+            with span("export.write"):
+                writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def format_size(nbytes):
+    """Human-readable byte count, e.g. 47.3 MB"""
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if nbytes < 1000 or unit == "GB":
+            return f"{nbytes:,.0f} {unit}" if unit == "bytes" else f"{nbytes:,.1f} {unit}"
+        nbytes /= 1000
+
+
+def csv_size(rows, chunk_rows=CHUNK_ROWS):
+    """Exact size of a CSV export: the header and one 16-character line per row"""
+    return len(TIMESTAMP_COLUMN) + 1 + rows * 17
+
+
+def _batches(rows, chunk_rows):
+    """Row counts of the record batches of rows timestamps written in chunks of chunk_rows"""
+    full, rest = divmod(rows, chunk_rows)
+    return [chunk_rows] * full + ([rest] if rest else [])
+
+
+def _batch_bytes(rows):
+    # int64 seconds and int32 dates, each buffer padded to 8 bytes
+    return rows * 8 + (rows * 4 + 7) // 8 * 8
+
+
+@functools.lru_cache(maxsize=None)
+def _measured_overhead(write):
+    """Sizes of a columnar export of no batch and of one one-row batch, and the size of each further one
+
+    Measured once by writing these small exports with the installed pyarrow, whose metadata
+    sizes differ between versions.
+    """
+    import numpy as np
+
+    timestamp = np.array(["2024-01-02T09:32"], dtype="datetime64[m]")
+    sizes = []
+    for chunks in ([], [timestamp], [timestamp, timestamp]):
+        out = io.BytesIO()
+        write(chunks, out)
+        sizes.append(len(out.getvalue()))
+    return sizes[0], sizes[1], sizes[2] - sizes[1]
+
+
+def _ipc_size(write, rows, chunk_rows):
+    """Exact size of an Arrow IPC export, from the measured metadata and each batch's buffers"""
+    empty, one_batch, per_batch = _measured_overhead(write)
+    batches = _batches(rows, chunk_rows)
+    if not batches:
+        return empty
+    buffers = sum(_batch_bytes(batch) - _batch_bytes(1) for batch in batches)
+    return one_batch + per_batch * (len(batches) - 1) + buffers
+
+
+def arrow_size(rows, chunk_rows=CHUNK_ROWS):
+    """Size of an Arrow IPC stream export, measured against the installed pyarrow"""
+    return _ipc_size(write_timestamps_arrow, rows, chunk_rows)
+
+
+def feather_size(rows, chunk_rows=CHUNK_ROWS):
+    """Size of a Feather export: the Arrow stream plus the file magic and footer"""
+    return _ipc_size(write_timestamps_feather, rows, chunk_rows)
+
+
+def parquet_size(rows, chunk_rows=CHUNK_ROWS):
+    """Approximate size of a Parquet export, whose encoding and compression leave about 8 bytes a row
+
+    The file and row group metadata are measured like those of the Arrow formats; only the
+    size of the encoded columns is estimated.
+    """
+    empty, one_batch, per_batch = _measured_overhead(write_timestamps_parquet)
+    batches = _batches(rows, chunk_rows)
+    if not batches:
+        return empty
+    return one_batch + per_batch * (len(batches) - 1) + 8 * (rows - len(batches))
+
+
+EXPORT_FORMATS = {
+    "csv": ExportFormat("CSV", ".csv", "text/csv", write_timestamps_csv, csv_size, True),
+    "parquet": ExportFormat(
+        "Parquet",
+        ".parquet",
+        "application/vnd.apache.parquet",
+        write_timestamps_parquet,
+        parquet_size,
+        False,
+    ),
+    "arrow": ExportFormat(
+        "Arrow IPC",
+        ".arrows",
+        "application/vnd.apache.arrow.stream",
+        write_timestamps_arrow,
+        arrow_size,
+        True,
+    ),
+    "feather": ExportFormat(
+        "Feather",
+        ".feather",
+        "application/vnd.apache.arrow.file",
+        write_timestamps_feather,
+        feather_size,
+        True,
+    ),
+}
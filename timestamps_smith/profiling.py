@@ -0,0 +1,203 @@
+"""Opt-in instrumentation of the generation stages: timing spans, cProfile and tracemalloc
+
+Each stage (calendar load, schedule build, week classification, filtering, grid expansion,
+formatting, export) runs under ``span(name)``. Outside of ``profile()`` a span is a shared no-op
+context manager, so instrumentation costs a global lookup per stage when profiling is off.
+
+Profiling is switched on with the TIMESTAMPS_SMITH_PROFILE environment variable (or the
+``profile`` query parameter of the app), a comma separated list of modes: ``spans`` (or ``1``)
+records the spans only, ``cprofile`` and ``tracemalloc`` also capture a cProfile report and the
+traced memory peak.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+PROFILE_ENV = "TIMESTAMPS_SMITH_PROFILE"
+PROFILE_MODES = ("spans", "cprofile", "tracemalloc")
+
+logger = logging.getLogger(__name__)
+
+# A finished span: start is relative to the start of the profile, both in seconds, and depth
+# the number of spans it is nested in on its thread
+Span = namedtuple("Span", ["name", "thread", "depth", "start", "duration"])
+
+# Profiles being recorded, in order of start; spans of every thread are recorded into each of them
+_active = ()
+_NO_SPAN = contextlib.nullcontext()
+_lock = threading.Lock()
+
+# Number of spans each thread is in, and of the recorded profiles using tracemalloc
+_local = threading.local()
+_tracing_profiles = 0
+_started_tracing = False
+
+
+def parse_profile_modes(value):
+    """Profiling modes of a TIMESTAMPS_SMITH_PROFILE value, or None if it disables profiling"""
+    names = {name.strip().lower() for name in (value or "").split(",")} - {""}
+    if not names or names <= {"0", "false", "off"}:
+        return None
+    modes = {"spans" if name in ("1", "true", "on") else name for name in names}
+    unknown = modes.difference(PROFILE_MODES)
+    if unknown:
+        raise ValueError(
+            f"unknown profiling mode {', '.join(sorted(unknown))!r}, "
+            f"expected one of {', '.join(PROFILE_MODES)}"
+        )
+    return frozenset(modes | {"spans"})
+
+
+def span(name):
+    """Context manager timing a stage under name while a profile is recorded, a no-op otherwise"""
+    profiles = _active
+    if not profiles:
+        return _NO_SPAN
+    return _SpanTimer(profiles, name)
+
+
+class _SpanTimer:
+    __slots__ = ("profiles", "name", "depth", "start")
+
+    def __init__(self, profiles, name):
+        self.profiles = profiles
+        self.name = name
+
+    def __enter__(self):
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        _local.depth = self.depth
+        thread = threading.current_thread().name
+        for profile in self.profiles:
+            profile._record(Span(self.name, thread, self.depth, self.start - profile.start, end - self.start))
+
+
+class Profile:
+    """Spans, and optionally a cProfile report and the traced memory peak, recorded by profile()
+
+    ``summary()`` aggregates the spans per stage and ``log()`` writes them as one JSON object
+    per line, for the CLI's structured log or any other logging handler.
+    """
+
+    def __init__(self, modes=("spans",)):
+        self.modes = frozenset(modes)
+        self.spans = []
+        self.start = time.perf_counter()
+        self.duration = None
+        self.cprofile = None  # pstats report text, with the "cprofile" mode
+        self.peak_memory = None  # bytes, with the "tracemalloc" mode
+        self.top_allocations = None  # "file:line: bytes" of the largest live allocations at the end
+        self._lock = threading.Lock()
+
+    def _record(self, finished):
+        with self._lock:
+            self.spans.append(finished)
+
+    def summary(self):
+        """Per-stage dicts of name, depth, calls, total and max time (ms), in order of first start"""
+        stages = {}
+        for finished in sorted(self.spans, key=lambda finished: finished.start):
+            stage = stages.setdefault(
+                finished.name,
+                {"name": finished.name, "depth": finished.depth, "calls": 0, "total_ms": 0.0, "max_ms": 0.0},
+            )
+            stage["calls"] += 1
+            stage["total_ms"] += finished.duration * 1000
+            stage["max_ms"] = max(stage["max_ms"], finished.duration * 1000)
+        for stage in stages.values():
+            stage["total_ms"] = round(stage["total_ms"], 3)
+            stage["max_ms"] = round(stage["max_ms"], 3)
+        return list(stages.values())
+
+    def log(self, log=logger, level=logging.INFO):
+        """Log the stage summary, then the memory peak and cProfile report, as JSON lines"""
+        for stage in self.summary():
+            log.log(level, json.dumps({"event": "span", **stage}))
+        totals = {"event": "profile", "total_ms": round((self.duration or 0) * 1000, 3)}
+        if self.peak_memory is not None:
+            totals["peak_memory"] = self.peak_memory
+            totals["top_allocations"] = self.top_allocations
+        log.log(level, json.dumps(totals))
+        if self.cprofile is not None:
+            log.log(level, json.dumps({"event": "cprofile", "report": self.cprofile}))
+
+
+@contextlib.contextmanager
+def profile(modes=("spans",)):
+    """Record a Profile of the stages run inside the block, in every thread
+
+    Profiles are process-wide, and profiles that overlap (nested, or started by other threads)
+    each record every span. The ``cprofile`` mode profiles the calling thread (every thread from
+    Python 3.12) and is skipped while another profiler is active, leaving ``cprofile`` None.
+    Overlapping ``tracemalloc`` profiles share the memory peak since the first of them started,
+    and tracing is left on if it was on before.
+    """
+    global _active, _tracing_profiles, _started_tracing
+
+    recording = Profile(modes)
+    with _lock:
+        _active += (recording,)
+
+    profiler = None
+    if "cprofile" in recording.modes:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # "Another profiling tool is already active", e.g. the cProfile of another profile
+            logger.debug("cProfile is already active, the profile has no cProfile report")
+            profiler = None
+
+    if "tracemalloc" in recording.modes:
+        import tracemalloc
+
+        with _lock:
+            if _tracing_profiles == 0:
+                _started_tracing = not tracemalloc.is_tracing()
+                if _started_tracing:
+                    tracemalloc.start()
+                tracemalloc.reset_peak()
+            _tracing_profiles += 1
+
+    try:
+        yield recording
+    finally:
+        recording.duration = time.perf_counter() - recording.start
+        with _lock:
+            _active = tuple(profile for profile in _active if profile is not recording)
+
+        if profiler is not None:
+            import io
+            import pstats
+
+            profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(30)
+            recording.cprofile = report.getvalue()
+
+        if "tracemalloc" in recording.modes:
+            recording.peak_memory = tracemalloc.get_traced_memory()[1]
+            statistics = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            recording.top_allocations = [
+                f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}: {stat.size}" for stat in statistics
+            ]
+            with _lock:
+                _tracing_profiles -= 1
+                if _tracing_profiles == 0 and _started_tracing:
+                    tracemalloc.stop()
+
+
+def env_profile_modes():
+    """Profiling modes set by the TIMESTAMPS_SMITH_PROFILE environment variable, or None"""
+    return parse_profile_modes(os.environ.get(PROFILE_ENV))